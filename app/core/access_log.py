@@ -0,0 +1,175 @@
+# core/access_log.py
+import asyncio
+import json
+import random
+import sys
+import time
+from typing import List, Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import env_bool, env_float, env_int
+
+
+ACCESS_LOG_ENABLED = env_bool("ACCESS_LOG_ENABLED", True)
+# fracción de peticiones registradas (los 5xx se registran siempre)
+ACCESS_LOG_SAMPLE_RATE = env_float("ACCESS_LOG_SAMPLE_RATE", 1.0)
+ACCESS_LOG_QUEUE_SIZE = env_int("ACCESS_LOG_QUEUE_SIZE", 10000)
+ACCESS_LOG_BATCH_SIZE = env_int("ACCESS_LOG_BATCH_SIZE", 500)
+ACCESS_LOG_FLUSH_INTERVAL = env_float("ACCESS_LOG_FLUSH_INTERVAL", 1.0)
+
+
+class AccessLogWriter:
+    """
+    Cola en memoria + tarea en segundo plano que escribe las entradas en
+    lotes como JSON por línea. El hot path solo hace put_nowait: si la cola
+    está llena la entrada se descarta y se cuenta, nunca se bloquea.
+    """
+
+    def __init__(self, stream=None, queue_size: int = ACCESS_LOG_QUEUE_SIZE,
+                 batch_size: int = ACCESS_LOG_BATCH_SIZE, flush_interval: float = ACCESS_LOG_FLUSH_INTERVAL):
+        self.stream = stream or sys.stdout
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # escritura en curso en su hilo: stop() la espera en lugar de perderla
+        self._writing: Optional[asyncio.Future] = None
+        self.written = 0
+        self.dropped = 0
+
+    def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Detiene la tarea, espera el lote que se estaba escribiendo y escribe
+        en lotes todo lo que quede en la cola.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._writing is not None:
+            try:
+                await self._writing
+            except Exception:
+                pass
+            self._writing = None
+        if self._queue is not None:
+            while True:
+                batch = self._drain([])
+                if not batch:
+                    break
+                await asyncio.to_thread(self._write, batch)
+            self._queue = None
+
+    def submit(self, entry: dict) -> None:
+        if self._queue is None:
+            return
+        try:
+            self._queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def _drain(self, batch: List[dict]) -> List[dict]:
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                first = await asyncio.wait_for(self._queue.get(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                continue
+            batch = self._drain([first])
+            # la escritura (síncrona) va a un hilo para no bloquear el event loop;
+            # shield: cancelar la tarea no abandona el lote a medio escribir
+            self._writing = asyncio.ensure_future(asyncio.to_thread(self._write, batch))
+            await asyncio.shield(self._writing)
+            self._writing = None
+
+    def _write(self, batch: List[dict]) -> None:
+        data = "".join(json.dumps(entry, separators=(",", ":")) + "\n" for entry in batch)
+        self.stream.write(data)
+        self.stream.flush()
+        self.written += len(batch)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": ACCESS_LOG_ENABLED,
+            "sample_rate": ACCESS_LOG_SAMPLE_RATE,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "written": self.written,
+            "dropped": self.dropped,
+        }
+
+
+access_log = AccessLogWriter()
+
+
+def route_template(scope: Scope, state: dict) -> str:
+    route = state.get("route")
+    if route is not None:
+        return route.template
+    endpoint = scope.get("route")
+    return getattr(endpoint, "path", scope.get("path", ""))
+
+
+class AccessLogMiddleware:
+    """
+    Middleware ASGI puro: mide la petición completa y registra método,
+    plantilla de ruta, upstream, status, bytes y latencias total y upstream.
+    La ruta y la latencia upstream las deja el proxy en scope["state"].
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not ACCESS_LOG_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        state = scope.setdefault("state", {})
+        status = 500
+        sent = 0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status, sent
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if status >= 500 or ACCESS_LOG_SAMPLE_RATE >= 1.0 or random.random() < ACCESS_LOG_SAMPLE_RATE:
+                route = state.get("route")
+                upstream_latency = state.get("upstream_latency")
+                trace = state.get("trace")
+                access_log.submit({
+                    "ts": round(time.time(), 3),
+                    "method": scope["method"],
+                    "route": route_template(scope, state),
+                    "path": scope["path"],
+                    "upstream": route.upstream if route is not None else None,
+                    "instance": state.get("upstream_instance"),
+                    "status": status,
+                    "bytes": sent,
+                    "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+                    "upstream_ms": round(upstream_latency * 1000, 3) if upstream_latency is not None else None,
+                    "trace_id": trace.trace_id if trace is not None else None,
+                })
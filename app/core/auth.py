@@ -0,0 +1,310 @@
+# core/auth.py
+import hmac
+import ipaddress
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import jwt
+from fastapi import HTTPException, Request
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import env_bool, env_float, env_int, env_list, env_str
+from app.core.runtime import GatewayRuntime, resolve
+
+
+# Claves: JWT_SECRET (HS*), JWT_PUBLIC_KEY_FILE (PEM, RS*/ES*) y/o
+# JWT_JWKS_FILE (JWKS local, se elige la clave por `kid`). RS*/ES* requieren
+# PyJWT[crypto].
+JWT_SECRET = env_str("JWT_SECRET", "")
+JWT_PUBLIC_KEY_FILE = env_str("JWT_PUBLIC_KEY_FILE", "")
+JWT_JWKS_FILE = env_str("JWT_JWKS_FILE", "")
+JWT_ALGORITHMS = env_list("JWT_ALGORITHMS", ["HS256"])
+JWT_AUDIENCE = env_list("JWT_AUDIENCE")
+JWT_ISSUER = env_str("JWT_ISSUER", "")
+JWT_LEEWAY = env_float("JWT_LEEWAY", 0.0)
+JWT_USER_ID_CLAIM = env_str("JWT_USER_ID_CLAIM", "sub")
+JWT_ROLES_CLAIM = env_str("JWT_ROLES_CLAIM", "roles")
+JWT_CACHE_SIZE = env_int("JWT_CACHE_SIZE", 10000)
+# por defecto se valida en el gateway si hay alguna clave configurada
+JWT_ENABLED = env_bool("JWT_ENABLED", bool(JWT_SECRET or JWT_PUBLIC_KEY_FILE or JWT_JWKS_FILE))
+
+# endpoints de administración (/gateway/*): token compartido en X-Admin-Token,
+# JWT verificado con el rol GATEWAY_ADMIN_ROLE o, con GATEWAY_ADMIN_LOCAL,
+# peticiones desde loopback (sin nada configurado solo se administra en local)
+GATEWAY_ADMIN_TOKEN = env_str("GATEWAY_ADMIN_TOKEN", "")
+GATEWAY_ADMIN_ROLE = env_str("GATEWAY_ADMIN_ROLE", "admin")
+GATEWAY_ADMIN_LOCAL = env_bool("GATEWAY_ADMIN_LOCAL", True)
+
+# headers de identidad de confianza para los backends; los que mande el
+# cliente se descartan siempre
+USER_ID_HEADER = b"x-user-id"
+USER_ROLES_HEADER = b"x-user-roles"
+TRUSTED_HEADERS = {USER_ID_HEADER, USER_ROLES_HEADER}
+
+
+class AuthError(Exception):
+    def __init__(self, detail: str):
+        super().__init__(detail)
+        self.detail = detail
+
+
+@dataclass
+class Identity:
+    subject: str
+    roles: List[str]
+    # exp del token (epoch), + leeway
+    expires_at: float
+    claims: Dict = field(default_factory=dict, repr=False)
+
+
+def bearer_token(scope: Scope) -> Optional[str]:
+    for key, value in scope["headers"]:
+        if key == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token.strip():
+                return token.strip()
+            return None
+    return None
+
+
+def _key_fits(key, algorithms: List[str]) -> bool:
+    """True si la clave sirve para alguno de los algoritmos (HS* con un PEM no)."""
+    for name in algorithms:
+        try:
+            jwt.get_algorithm_by_name(name).prepare_key(key)
+        except (jwt.PyJWTError, ValueError, TypeError):
+            continue
+        return True
+    return False
+
+
+def _roles(claim) -> List[str]:
+    if claim is None:
+        return []
+    if isinstance(claim, str):
+        return [role for role in claim.replace(",", " ").split() if role]
+    if isinstance(claim, (list, tuple)):
+        return [str(role) for role in claim]
+    return [str(claim)]
+
+
+# =====================================================
+#            VERIFICACIÓN + CACHE DE TOKENS
+# =====================================================
+class TokenVerifier:
+    """
+    Verifica firma, exp, aud e iss con PyJWT. Los tokens válidos se guardan
+    en un LRU (JWT_CACHE_SIZE) hasta su exp: un acierto evita repetir la
+    verificación criptográfica. Los inválidos no se cachean.
+    """
+
+    def __init__(self, max_entries: int = JWT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._keys: List = []
+        self._jwks: Dict[str, object] = {}
+        self._cache: "OrderedDict[str, Identity]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+
+    def load_keys(self) -> None:
+        """
+        Lee las claves de la configuración (en el arranque de cada worker).
+        Un algoritmo no soportado o una clave que no sirve para ninguno de
+        JWT_ALGORITHMS impiden arrancar, en lugar de un error en cada petición.
+        """
+        for name in JWT_ALGORITHMS:
+            try:
+                jwt.get_algorithm_by_name(name)
+            except NotImplementedError as exc:
+                raise RuntimeError(f"JWT_ALGORITHMS: {name} no soportado (RS*/ES* requieren PyJWT[crypto])") from exc
+        keys: List = []
+        jwks: Dict[str, object] = {}
+        sources: List[Tuple[str, object]] = []
+        if JWT_SECRET:
+            keys.append(JWT_SECRET)
+            sources.append(("JWT_SECRET", JWT_SECRET))
+        if JWT_PUBLIC_KEY_FILE:
+            with open(JWT_PUBLIC_KEY_FILE, "rb") as f:
+                keys.append(f.read())
+            sources.append(("JWT_PUBLIC_KEY_FILE", keys[-1]))
+        if JWT_JWKS_FILE:
+            with open(JWT_JWKS_FILE, encoding="utf-8") as f:
+                for jwk in jwt.PyJWKSet.from_dict(json.load(f)).keys:
+                    jwks[jwk.key_id or ""] = jwk.key
+                    sources.append((f"JWT_JWKS_FILE (kid={jwk.key_id})", jwk.key))
+        for source, key in sources:
+            if not _key_fits(key, JWT_ALGORITHMS):
+                raise RuntimeError(f"{source}: la clave no sirve para JWT_ALGORITHMS={','.join(JWT_ALGORITHMS)}")
+        self._keys, self._jwks = keys, jwks
+        self.reset()
+
+    def reset(self) -> None:
+        self._cache.clear()
+        self.hits = self.misses = self.rejected = 0
+
+    def verify(self, token: str) -> Identity:
+        now = time.time()
+        identity = self._cache.get(token)
+        if identity is not None:
+            if now < identity.expires_at:
+                self._cache.move_to_end(token)
+                self.hits += 1
+                return identity
+            del self._cache[token]
+        self.misses += 1
+        try:
+            identity = self._decode(token)
+        except AuthError:
+            self.rejected += 1
+            raise
+        self._cache[token] = identity
+        if len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return identity
+
+    def _decode(self, token: str) -> Identity:
+        try:
+            header = jwt.get_unverified_header(token)
+        except jwt.PyJWTError:
+            raise AuthError("Token mal formado")
+        kid = header.get("kid")
+        keys = [self._jwks[kid]] if kid in self._jwks else self._keys + list(self._jwks.values())
+        if not keys:
+            raise AuthError("No hay claves para validar el token")
+
+        for key in keys:
+            try:
+                claims = jwt.decode(
+                    token,
+                    key,
+                    algorithms=JWT_ALGORITHMS,
+                    audience=JWT_AUDIENCE or None,
+                    issuer=JWT_ISSUER or None,
+                    leeway=JWT_LEEWAY,
+                    options={"require": ["exp"], "verify_aud": bool(JWT_AUDIENCE)},
+                )
+            except (jwt.InvalidSignatureError, jwt.InvalidKeyError):
+                # firma de otra clave, o clave de otro tipo que el alg del token
+                continue
+            except jwt.ExpiredSignatureError:
+                raise AuthError("Token expirado")
+            except jwt.InvalidAudienceError:
+                raise AuthError("Audiencia no válida")
+            except jwt.PyJWTError as exc:
+                raise AuthError(f"Token inválido: {exc}")
+            subject = claims.get(JWT_USER_ID_CLAIM)
+            if subject is None:
+                raise AuthError(f"Falta el claim {JWT_USER_ID_CLAIM}")
+            return Identity(
+                subject=str(subject),
+                roles=_roles(claims.get(JWT_ROLES_CLAIM)),
+                expires_at=float(claims["exp"]) + JWT_LEEWAY,
+                claims=claims,
+            )
+        raise AuthError("Firma inválida")
+
+    def stats(self) -> dict:
+        return {
+            "enabled": JWT_ENABLED,
+            "cached": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "rejected": self.rejected,
+        }
+
+
+token_verifier = TokenVerifier()
+
+
+# =====================================================
+#            ENDPOINTS DE ADMINISTRACIÓN
+# =====================================================
+def _is_loopback(host: Optional[str]) -> bool:
+    try:
+        return host is not None and ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def is_admin(request: Request) -> bool:
+    token = request.headers.get("x-admin-token")
+    if GATEWAY_ADMIN_TOKEN and token and hmac.compare_digest(token.encode(), GATEWAY_ADMIN_TOKEN.encode()):
+        return True
+    if JWT_ENABLED and GATEWAY_ADMIN_ROLE:
+        bearer = bearer_token(request.scope)
+        if bearer is not None:
+            try:
+                if GATEWAY_ADMIN_ROLE in token_verifier.verify(bearer).roles:
+                    return True
+            except AuthError:
+                pass
+    return GATEWAY_ADMIN_LOCAL and _is_loopback(request.client.host if request.client else None)
+
+
+async def require_admin(request: Request) -> None:
+    """Dependencia de los endpoints /gateway/*: 403 si no es un administrador."""
+    if not is_admin(request):
+        raise HTTPException(status_code=403, detail="Solo para administradores del gateway")
+
+
+# =====================================================
+#                 MIDDLEWARE ASGI
+# =====================================================
+def unauthorized(detail: str, invalid_token: bool = True) -> JSONResponse:
+    challenge = 'Bearer error="invalid_token"' if invalid_token else "Bearer"
+    return JSONResponse({"detail": detail}, status_code=401, headers={"WWW-Authenticate": challenge})
+
+
+def identity_headers(headers: List[Tuple[bytes, bytes]], identity: Optional[Identity]) -> List[Tuple[bytes, bytes]]:
+    """Quita los X-User-* del cliente y añade los verificados."""
+    clean = [(key, value) for key, value in headers if key not in TRUSTED_HEADERS]
+    if identity is not None:
+        clean.append((USER_ID_HEADER, identity.subject.encode("latin-1", "replace")))
+        clean.append((USER_ROLES_HEADER, ",".join(identity.roles).encode("latin-1", "replace")))
+    return clean
+
+
+class AuthMiddleware:
+    """
+    Valida el JWT Bearer de las rutas proxy según Route.auth antes de llamar
+    al upstream: un token inválido o expirado responde 401 en el gateway. La
+    identidad verificada queda en scope["state"]["identity"] y el proxy la
+    reenvía como X-User-Id / X-User-Roles (request_headers); los X-User-* del
+    cliente los quita el proxy en cualquier caso, también sin JWT_ENABLED.
+    """
+
+    def __init__(self, app: ASGIApp, runtime: GatewayRuntime):
+        self.app = app
+        self.runtime = runtime
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not JWT_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        match, _ = resolve(self.runtime, scope)
+        if match is None:
+            await self.app(scope, receive, send)
+            return
+
+        mode = match.route.auth
+        if mode != "none":
+            token = bearer_token(scope)
+            if token is None:
+                if mode == "required":
+                    await unauthorized("Falta el token Bearer", invalid_token=False)(scope, receive, send)
+                    return
+            else:
+                try:
+                    identity = token_verifier.verify(token)
+                except AuthError as exc:
+                    await unauthorized(exc.detail)(scope, receive, send)
+                    return
+                scope["state"]["identity"] = identity
+
+        await self.app(scope, receive, send)
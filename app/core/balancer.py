@@ -0,0 +1,140 @@
+# core/balancer.py
+import random
+from typing import Callable, List, Optional
+
+import httpx
+
+
+ROUND_ROBIN = "round_robin"
+LEAST_OUTSTANDING = "least_outstanding"
+POWER_OF_TWO = "p2c"
+STRATEGIES = (ROUND_ROBIN, LEAST_OUTSTANDING, POWER_OF_TWO)
+
+
+class NoInstanceError(Exception):
+    def __init__(self, upstream: str):
+        super().__init__(f"El upstream '{upstream}' no tiene instancias configuradas")
+        self.upstream = upstream
+
+
+class Instance:
+    """Una instancia (URL base) de un microservicio."""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.healthy = True
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.consecutive_successes = 0
+        self.last_check: Optional[float] = None
+
+    def acquire(self) -> None:
+        self.outstanding += 1
+        self.requests += 1
+
+    def release(self) -> None:
+        self.outstanding = max(0, self.outstanding - 1)
+
+    def mark(self, ok: bool, unhealthy_threshold: int, healthy_threshold: int) -> None:
+        """Resultado de un health check (o de un fallo pasivo de conexión)."""
+        if ok:
+            self.consecutive_failures = 0
+            self.consecutive_successes += 1
+            if not self.healthy and self.consecutive_successes >= healthy_threshold:
+                self.healthy = True
+        else:
+            self.failures += 1
+            self.consecutive_successes = 0
+            self.consecutive_failures += 1
+            if self.healthy and self.consecutive_failures >= unhealthy_threshold:
+                self.healthy = False
+
+    def stats(self) -> dict:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+        }
+
+
+class UpstreamGroup:
+    """
+    Conjunto de instancias de un servicio con su estrategia de balanceo:
+    round_robin, least_outstanding o p2c (power of two choices). Solo se
+    eligen instancias sanas; si ninguna lo está se usan todas (fail-open)
+    para no dejar el servicio sin tráfico por un health check erróneo.
+    """
+
+    def __init__(self, name: str, urls: List[str], strategy: str = ROUND_ROBIN,
+                 previous: Optional["UpstreamGroup"] = None):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Estrategia de balanceo desconocida: {strategy}")
+        self.name = name
+        # al recargar la configuración, las URLs que siguen conservan su
+        # Instance (salud y peticiones en curso)
+        known = {instance.url: instance for instance in previous.instances} if previous else {}
+        self.instances = [known.get(url.rstrip("/")) or Instance(url) for url in urls]
+        self.strategy = strategy
+        self._next = 0
+
+    def candidates(self) -> List[Instance]:
+        healthy = [instance for instance in self.instances if instance.healthy]
+        return healthy or self.instances
+
+    def pick(self, exclude: Optional[Instance] = None) -> Instance:
+        candidates = self.candidates()
+        if exclude is not None and len(candidates) > 1:
+            candidates = [instance for instance in candidates if instance is not exclude]
+        if not candidates:
+            raise NoInstanceError(self.name)
+        if len(candidates) == 1:
+            return candidates[0]
+        if self.strategy == LEAST_OUTSTANDING:
+            start = self._next % len(candidates)
+            self._next += 1
+            rotated = candidates[start:] + candidates[:start]
+            return min(rotated, key=lambda instance: instance.outstanding)
+        if self.strategy == POWER_OF_TWO:
+            first, second = random.sample(candidates, 2)
+            return first if first.outstanding <= second.outstanding else second
+        instance = candidates[self._next % len(candidates)]
+        self._next += 1
+        return instance
+
+    def stats(self) -> dict:
+        return {
+            "strategy": self.strategy,
+            "instances": [instance.stats() for instance in self.instances],
+        }
+
+
+class TrackedStream(httpx.AsyncByteStream):
+    """
+    Envuelve el stream de una respuesta httpx para ejecutar `on_close` una
+    sola vez cuando se cierra (fin de body, error o desconexión del cliente).
+    Así `outstanding` cuenta la petición hasta que termina de verdad.
+    """
+
+    def __init__(self, stream: httpx.AsyncByteStream, on_close: Callable[[], None]):
+        self._stream = stream
+        self._on_close: Optional[Callable[[], None]] = on_close
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._on_close is not None:
+                on_close, self._on_close = self._on_close, None
+                on_close()
+
+
+def track_response(resp: httpx.Response, on_close: Callable[[], None]) -> None:
+    resp.stream = TrackedStream(resp.stream, on_close)
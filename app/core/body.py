@@ -0,0 +1,152 @@
+# core/body.py
+import asyncio
+import mmap
+import tempfile
+from typing import AsyncIterator, Optional, Union
+
+from fastapi import Request
+
+from app.core.config import env_int, env_str
+
+
+# tamaño máximo de body por defecto; Route.max_body lo cambia por ruta
+BODY_MAX_BYTES = env_int("BODY_MAX_BYTES", 10 * 1024 * 1024)
+# bodies reproducibles (Route.spool) hasta este tamaño quedan en memoria; el
+# resto va a un fichero temporal
+BODY_SPOOL_MEMORY_BYTES = env_int("BODY_SPOOL_MEMORY_BYTES", 1024 * 1024)
+BODY_SPOOL_DIR = env_str("BODY_SPOOL_DIR", "") or None
+# chunks con que se reenvía un body desde disco y tamaño de cada escritura
+BODY_CHUNK_BYTES = 64 * 1024
+SPOOL_WRITE_BYTES = 1024 * 1024
+
+
+class BodyTooLargeError(Exception):
+    def __init__(self, limit: int):
+        super().__init__(f"Body mayor que {limit} bytes")
+        self.limit = limit
+
+
+def body_limit(max_body: Optional[int]) -> int:
+    return max_body if max_body is not None else BODY_MAX_BYTES
+
+
+def check_content_length(request: Request, limit: int) -> None:
+    """413 temprano, antes de leer nada, si Content-Length ya supera el límite."""
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > limit:
+        body_spool.rejected += 1
+        raise BodyTooLargeError(limit)
+
+
+async def limited_stream(request: Request, limit: int) -> AsyncIterator[bytes]:
+    """request.stream() con cuenta de bytes: corta con 413 al pasar el límite."""
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > limit:
+            body_spool.rejected += 1
+            raise BodyTooLargeError(limit)
+        yield chunk
+
+
+async def read_limited(request: Request, limit: int) -> bytes:
+    return b"".join([chunk async for chunk in limited_stream(request, limit)])
+
+
+class SpooledBody:
+    """
+    Body leído entero antes de contactar al upstream: en memoria si es
+    pequeño, en un fichero temporal (ya borrado del directorio) si no. Se
+    puede reenviar tantas veces como intentos haya; desde disco se lee con
+    mmap en chunks, sin volver a cargarlo en RAM.
+    """
+
+    def __init__(self):
+        self.size = 0
+        self._memory = bytearray()
+        self._file = None
+        self._map: Optional[mmap.mmap] = None
+
+    @property
+    def on_disk(self) -> bool:
+        return self._file is not None
+
+    async def fill(self, chunks: AsyncIterator[bytes]) -> None:
+        pending = bytearray()
+        async for chunk in chunks:
+            self.size += len(chunk)
+            if self._file is None and self.size <= BODY_SPOOL_MEMORY_BYTES:
+                self._memory += chunk
+                continue
+            if self._file is None:
+                self._file = tempfile.TemporaryFile(dir=BODY_SPOOL_DIR)
+                body_spool.on_disk += 1
+                pending, self._memory = self._memory, bytearray()
+            pending += chunk
+            if len(pending) >= SPOOL_WRITE_BYTES:
+                # la escritura va a un hilo para no bloquear el event loop
+                await asyncio.to_thread(self._file.write, pending)
+                pending = bytearray()
+        if self._file is not None:
+            if pending:
+                await asyncio.to_thread(self._file.write, pending)
+            await asyncio.to_thread(self._file.flush)
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def content(self) -> Union[bytes, AsyncIterator[bytes]]:
+        """Contenido para un intento; cada llamada empieza desde el principio."""
+        if self._map is None:
+            return bytes(self._memory)
+        return self._iter_map(self._map)
+
+    @staticmethod
+    async def _iter_map(data: mmap.mmap) -> AsyncIterator[bytes]:
+        for offset in range(0, len(data), BODY_CHUNK_BYTES):
+            yield data[offset:offset + BODY_CHUNK_BYTES]
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            body_spool.on_disk -= 1
+
+
+class BodySpool:
+    """Contadores de los bodies reproducibles y de los rechazados con 413."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.spooled = 0
+        self.spooled_to_disk = 0
+        self.on_disk = 0
+        self.rejected = 0
+
+    async def spool(self, request: Request, limit: int) -> SpooledBody:
+        body = SpooledBody()
+        try:
+            await body.fill(limited_stream(request, limit))
+        except BaseException:
+            body.close()
+            raise
+        self.spooled += 1
+        if body.on_disk:
+            self.spooled_to_disk += 1
+        return body
+
+    def stats(self) -> dict:
+        return {
+            "max_bytes": BODY_MAX_BYTES,
+            "spool_memory_bytes": BODY_SPOOL_MEMORY_BYTES,
+            "spooled": self.spooled,
+            "spooled_to_disk": self.spooled_to_disk,
+            "on_disk": self.on_disk,
+            "rejected": self.rejected,
+        }
+
+
+body_spool = BodySpool()
@@ -0,0 +1,189 @@
+# core/breaker.py
+import math
+import time
+from dataclasses import dataclass
+from typing import List
+
+from app.core.config import env_bool, env_float, env_int, env_prefix
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+@dataclass
+class BreakerConfig:
+    enabled: bool
+    window_seconds: int
+    min_requests: int
+    error_rate: float
+    slow_call_seconds: float
+    slow_call_rate: float
+    open_seconds: float
+    half_open_probes: int
+
+
+def load_breaker_config(name: str) -> BreakerConfig:
+    """<PREFIJO>_BREAKER_* por upstream, con BREAKER_* como valor global."""
+    prefix = env_prefix(name)
+
+    def pick(suffix: str, reader, default):
+        return reader(f"{prefix}_BREAKER_{suffix}", reader(f"BREAKER_{suffix}", default))
+
+    return BreakerConfig(
+        enabled=pick("ENABLED", env_bool, True),
+        window_seconds=pick("WINDOW", env_int, 10),
+        min_requests=pick("MIN_REQUESTS", env_int, 20),
+        error_rate=pick("ERROR_RATE", env_float, 0.5),
+        slow_call_seconds=pick("SLOW_CALL_SECONDS", env_float, 5.0),
+        slow_call_rate=pick("SLOW_CALL_RATE", env_float, 0.8),
+        open_seconds=pick("OPEN_SECONDS", env_float, 15.0),
+        half_open_probes=pick("HALF_OPEN_PROBES", env_int, 3),
+    )
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, upstream: str, retry_after: float):
+        super().__init__(f"Circuito abierto para el upstream '{upstream}'")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class _Bucket:
+    __slots__ = ("second", "total", "errors", "slow")
+
+    def __init__(self):
+        self.second = -1
+        self.total = 0
+        self.errors = 0
+        self.slow = 0
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por upstream (closed / open / half-open).
+
+    - closed: se cuentan peticiones, errores (5xx o fallo de transporte) y
+      llamadas lentas en una ventana deslizante de buckets de 1s. Si hay al
+      menos min_requests y se supera error_rate o slow_call_rate, se abre.
+    - open: se falla rápido durante open_seconds.
+    - half_open: se dejan pasar half_open_probes peticiones de prueba; si
+      todas van bien se cierra, si una falla se vuelve a abrir.
+    """
+
+    def __init__(self, name: str, config: BreakerConfig):
+        self.name = name
+        self.config = config
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+        self._buckets: List[_Bucket] = [_Bucket() for _ in range(config.window_seconds)]
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+
+    # -------------------------------------------------
+    def before_request(self) -> None:
+        """Lanza CircuitOpenError si la petición no debe llegar al upstream."""
+        if not self.config.enabled or self.state == CLOSED:
+            return
+        now = time.monotonic()
+        if self.state == OPEN:
+            remaining = self.opened_at + self.config.open_seconds - now
+            if remaining > 0:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, remaining)
+            self._half_open()
+        if self._probes_in_flight >= self.config.half_open_probes:
+            self.rejected += 1
+            raise CircuitOpenError(self.name, 1.0)
+        self._probes_in_flight += 1
+
+    def record(self, ok: bool, latency: float) -> None:
+        if not self.config.enabled:
+            return
+        if self.state == HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            if not ok or latency >= self.config.slow_call_seconds:
+                self._open()
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.config.half_open_probes:
+                self._close()
+            return
+        if self.state == OPEN:
+            # respuestas de peticiones que salieron antes de abrir
+            return
+
+        bucket = self._bucket(int(time.monotonic()))
+        bucket.total += 1
+        if not ok:
+            bucket.errors += 1
+        if latency >= self.config.slow_call_seconds:
+            bucket.slow += 1
+        self._evaluate()
+
+    def release(self) -> None:
+        """La petición se canceló sin resultado (p.ej. el cliente se fue)."""
+        if self.state == HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    # -------------------------------------------------
+    def _bucket(self, second: int) -> _Bucket:
+        bucket = self._buckets[second % len(self._buckets)]
+        if bucket.second != second:
+            bucket.second = second
+            bucket.total = bucket.errors = bucket.slow = 0
+        return bucket
+
+    def _window(self):
+        oldest = int(time.monotonic()) - len(self._buckets)
+        total = errors = slow = 0
+        for bucket in self._buckets:
+            if bucket.second > oldest:
+                total += bucket.total
+                errors += bucket.errors
+                slow += bucket.slow
+        return total, errors, slow
+
+    def _evaluate(self) -> None:
+        total, errors, slow = self._window()
+        if total < self.config.min_requests:
+            return
+        if errors / total >= self.config.error_rate or slow / total >= self.config.slow_call_rate:
+            self._open()
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+
+    def _half_open(self) -> None:
+        self.state = HALF_OPEN
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+
+    def _close(self) -> None:
+        self.state = CLOSED
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        for bucket in self._buckets:
+            bucket.second = -1
+
+    def stats(self) -> dict:
+        total, errors, slow = self._window()
+        retry_after = 0.0
+        if self.state == OPEN:
+            retry_after = max(0.0, self.opened_at + self.config.open_seconds - time.monotonic())
+        return {
+            "state": self.state,
+            "window_requests": total,
+            "window_errors": errors,
+            "window_slow": slow,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+            "retry_after": math.ceil(retry_after),
+        }
@@ -0,0 +1,162 @@
+# core/bulkhead.py
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Optional, Tuple
+
+from app.core.config import env_bool, env_float, env_int, env_prefix
+
+
+HIGH = "high"
+NORMAL = "normal"
+
+
+@dataclass
+class BulkheadConfig:
+    enabled: bool
+    # llamadas concurrentes al upstream; None = max_connections del pool
+    max_concurrent: Optional[int]
+    max_queue: int
+    queue_timeout: float
+    # CoDel: espera objetivo en cola y ventana para declarar sobrecarga
+    target_delay: float
+    interval: float
+
+
+def load_bulkhead_config(name: str) -> BulkheadConfig:
+    """<PREFIJO>_BULKHEAD_* por upstream, con BULKHEAD_* como valor global."""
+    prefix = env_prefix(name)
+
+    def pick(suffix: str, reader, default):
+        return reader(f"{prefix}_BULKHEAD_{suffix}", reader(f"BULKHEAD_{suffix}", default))
+
+    max_concurrent = pick("MAX_CONCURRENT", env_int, 0)
+    return BulkheadConfig(
+        enabled=pick("ENABLED", env_bool, True),
+        max_concurrent=max_concurrent or None,
+        max_queue=pick("MAX_QUEUE", env_int, 200),
+        queue_timeout=pick("QUEUE_TIMEOUT", env_float, 1.0),
+        target_delay=pick("TARGET_DELAY", env_float, 0.05),
+        interval=pick("INTERVAL", env_float, 0.1),
+    )
+
+
+class BulkheadRejectedError(Exception):
+    """La petición no obtuvo hueco en el bulkhead del upstream."""
+
+    def __init__(self, upstream: str, reason: str):
+        super().__init__(f"Upstream '{upstream}' saturado ({reason})")
+        self.upstream = upstream
+        self.reason = reason
+
+
+class Bulkhead:
+    """
+    Límite de llamadas concurrentes a un upstream con cola de espera acotada
+    y timeout de cola: un upstream lento solo agota sus propios huecos.
+
+    Funciona como un asyncio.Semaphore con dos colas FIFO (las rutas `high`,
+    p. ej. /auth/*, se atienden antes) y descarte adaptativo estilo CoDel: si
+    la espera en cola supera `target_delay` durante todo un `interval`, el
+    upstream se considera sobrecargado y las peticiones normales que tendrían
+    que esperar se rechazan al momento (503) hasta que la cola se vacía o la
+    espera vuelve a bajar del objetivo.
+    """
+
+    def __init__(self, upstream: str, config: BulkheadConfig, max_concurrent: int):
+        self.upstream = upstream
+        self.config = config
+        self.max_concurrent = config.max_concurrent or max_concurrent
+        self.active = 0
+        self._queues: Dict[str, Deque[Tuple[asyncio.Future, float]]] = {HIGH: deque(), NORMAL: deque()}
+        # CoDel: instante a partir del cual, si la espera sigue alta, se descarta
+        self._first_above: Optional[float] = None
+        self.dropping = False
+        self.delay = 0.0
+        self.rejected = {"queue_full": 0, "queue_timeout": 0, "shed": 0}
+
+    @property
+    def queued(self) -> int:
+        return len(self._queues[HIGH]) + len(self._queues[NORMAL])
+
+    async def acquire(self, priority: str = NORMAL) -> None:
+        if not self.config.enabled:
+            return
+        if self.active < self.max_concurrent and not self.queued:
+            self.active += 1
+            return
+        if priority != HIGH and self.dropping:
+            self.rejected["shed"] += 1
+            raise BulkheadRejectedError(self.upstream, "shed")
+        if self.queued >= self.config.max_queue:
+            self.rejected["queue_full"] += 1
+            raise BulkheadRejectedError(self.upstream, "queue_full")
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (future, time.monotonic())
+        queue = self._queues[HIGH if priority == HIGH else NORMAL]
+        queue.append(entry)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.config.queue_timeout)
+        except asyncio.TimeoutError:
+            self._abandon(queue, entry)
+            self.rejected["queue_timeout"] += 1
+            raise BulkheadRejectedError(self.upstream, "queue_timeout")
+        except BaseException:
+            self._abandon(queue, entry)
+            raise
+
+    def _abandon(self, queue: Deque, entry: Tuple[asyncio.Future, float]) -> None:
+        future = entry[0]
+        if future.done() and not future.cancelled():
+            # el hueco llegó justo al expirar: se devuelve
+            self.release()
+            return
+        future.cancel()
+        try:
+            queue.remove(entry)
+        except ValueError:
+            pass
+
+    def release(self) -> None:
+        if not self.config.enabled:
+            return
+        now = time.monotonic()
+        for priority in (HIGH, NORMAL):
+            queue = self._queues[priority]
+            while queue:
+                future, enqueued_at = queue.popleft()
+                if future.done():
+                    continue
+                # el hueco pasa directamente al siguiente en cola
+                future.set_result(None)
+                if priority == NORMAL:
+                    # CoDel mide la cola que se puede descartar
+                    self._observe(now - enqueued_at, now)
+                return
+        self.active -= 1
+        self._first_above = None
+        self.dropping = False
+
+    def _observe(self, sojourn: float, now: float) -> None:
+        self.delay = sojourn
+        if sojourn < self.config.target_delay:
+            self._first_above = None
+            self.dropping = False
+        elif self._first_above is None:
+            self._first_above = now + self.config.interval
+        elif now >= self._first_above:
+            self.dropping = True
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.config.enabled,
+            "max_concurrent": self.max_concurrent,
+            "active": self.active,
+            "queued": {HIGH: len(self._queues[HIGH]), NORMAL: len(self._queues[NORMAL])},
+            "max_queue": self.config.max_queue,
+            "queue_delay": round(self.delay, 4),
+            "shedding": self.dropping,
+            "rejected": dict(self.rejected),
+        }
@@ -0,0 +1,184 @@
+# core/cache.py
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from fastapi import Request
+
+from app.core.config import env_bool, env_int, env_str
+
+
+CACHE_ENABLED = env_bool("CACHE_ENABLED", True)
+CACHE_MAX_BYTES = env_int("CACHE_MAX_BYTES", 64 * 1024 * 1024)
+CACHE_MAX_ENTRY_BYTES = env_int("CACHE_MAX_ENTRY_BYTES", 1024 * 1024)
+# headers de la petición que forman parte de la clave (Vary del gateway)
+CACHE_VARY_HEADERS = [
+    h.strip().lower()
+    for h in (env_str("CACHE_VARY_HEADERS", "authorization,cookie,accept,accept-encoding") or "").split(",")
+    if h.strip()
+]
+
+CacheKey = Tuple[str, str, Tuple[str, ...]]
+
+
+@dataclass
+class CacheEntry:
+    status_code: int
+    headers: Dict[str, str]
+    body: bytes
+    etag: Optional[str]
+    stored_at: float
+    expires_at: float
+    resource: str
+
+    @property
+    def size(self) -> int:
+        return len(self.body)
+
+
+# =====================================================
+#                 CACHE-CONTROL
+# =====================================================
+def parse_cache_control(value: Optional[str]) -> Dict[str, Optional[str]]:
+    directives: Dict[str, Optional[str]] = {}
+    for part in (value or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, arg = part.partition("=")
+        directives[name.strip().lower()] = arg.strip().strip('"') or None
+    return directives
+
+
+def request_bypasses_cache(request: Request) -> bool:
+    directives = parse_cache_control(request.headers.get("cache-control"))
+    return "no-cache" in directives or "no-store" in directives
+
+
+def response_ttl(route_ttl: float, status_code: int, headers) -> Optional[float]:
+    """
+    TTL efectivo de una respuesta upstream, o None si no se puede cachear.
+    Respeta no-store/no-cache/private y acota el TTL de la ruta con
+    s-maxage/max-age. Un Vary sobre headers fuera de la clave la excluye.
+    """
+    if status_code != 200:
+        return None
+    directives = parse_cache_control(headers.get("cache-control"))
+    if {"no-store", "no-cache", "private"} & directives.keys():
+        return None
+    vary = {h.strip().lower() for h in headers.get("vary", "").split(",") if h.strip()}
+    if "*" in vary or not vary <= set(CACHE_VARY_HEADERS):
+        return None
+    ttl = route_ttl
+    for directive in ("s-maxage", "max-age"):
+        if directives.get(directive) is not None:
+            try:
+                ttl = min(ttl, float(directives[directive]))
+            except ValueError:
+                return None
+            break
+    return ttl if ttl > 0 else None
+
+
+def resource_of(prefix: str, upstream_path: str) -> str:
+    """Recurso al que pertenece un path: prefijo + primer segmento (/inventory-service/producto)."""
+    first = upstream_path.lstrip("/").split("/", 1)[0]
+    return f"{prefix}/{first}"
+
+
+# =====================================================
+#             CACHE LRU ACOTADA POR BYTES
+# =====================================================
+class ResponseCache:
+    """
+    Cache en proceso de respuestas GET. LRU acotada por el total de bytes
+    almacenados, con índice por recurso para invalidar todas las entradas
+    de /producto cuando pasa un POST/PATCH/PUT/DELETE sobre /producto.
+    """
+
+    def __init__(self, max_bytes: int, max_entry_bytes: int, vary_headers: List[str]):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.vary_headers = vary_headers
+        self._entries: "OrderedDict[CacheKey, CacheEntry]" = OrderedDict()
+        self._by_resource: Dict[str, Set[CacheKey]] = {}
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def key_for(self, request: Request) -> CacheKey:
+        vary = tuple(request.headers.get(h, "") for h in self.vary_headers)
+        return request.url.path, request.url.query, vary
+
+    def get(self, key: CacheKey) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: CacheKey, entry: CacheEntry) -> None:
+        if entry.size > self.max_entry_bytes or entry.size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        self._by_resource.setdefault(entry.resource, set()).add(key)
+        self.total_bytes += entry.size
+        while self.total_bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, resource: str) -> None:
+        keys = self._by_resource.pop(resource, None)
+        if not keys:
+            return
+        for key in keys:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.total_bytes -= entry.size
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._by_resource.clear()
+        self.total_bytes = 0
+
+    def reset(self) -> None:
+        """Cache vacía y contadores a cero (arranque de cada worker)."""
+        self.clear()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def _remove(self, key: CacheKey) -> None:
+        entry = self._entries.pop(key)
+        self.total_bytes -= entry.size
+        keys = self._by_resource.get(entry.resource)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_resource[entry.resource]
+
+    def stats(self) -> dict:
+        return {
+            "enabled": CACHE_ENABLED,
+            "entries": len(self._entries),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+response_cache = ResponseCache(CACHE_MAX_BYTES, CACHE_MAX_ENTRY_BYTES, CACHE_VARY_HEADERS)
@@ -0,0 +1,364 @@
+# core/compose.py
+import asyncio
+import base64
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote, unquote, urlsplit
+
+import httpx
+from fastapi import Request
+from fastapi.responses import JSONResponse
+
+from app.core.config import env_float, env_int
+from app.core.routing import RouteTable
+
+
+# timeout de cada parte si el agregado no define otro
+COMPOSE_PART_TIMEOUT = env_float("COMPOSE_PART_TIMEOUT", 5.0)
+# POST /batch: sub-peticiones por lote y cuántas se ejecutan a la vez
+BATCH_MAX_REQUESTS = env_int("BATCH_MAX_REQUESTS", 100)
+BATCH_CONCURRENCY = env_int("BATCH_CONCURRENCY", 10)
+
+# headers de la petición original que se propagan a las sub-peticiones
+FORWARDED_HEADERS = ("authorization", "cookie", "x-api-key", "accept-language", "traceparent", "tracestate")
+
+
+# =====================================================
+#            SUB-PETICIONES INTERNAS (IN-PROCESS)
+# =====================================================
+def app_client(app, client: Tuple[str, int] = ("127.0.0.1", 0), **kwargs) -> httpx.AsyncClient:
+    """
+    Cliente que ejecuta sub-peticiones contra la propia app ASGI, sin red:
+    pasan por los mismos middlewares (JWT, rate limit, métricas, access log),
+    la tabla de rutas, la cache y el single-flight que una petición externa.
+    """
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False, client=client)
+    # identity: la respuesta interna no se comprime para volver a descomprimirla
+    return httpx.AsyncClient(
+        transport=transport, base_url="http://gateway.internal", headers={"accept-encoding": "identity"}, **kwargs
+    )
+
+
+def internal_client(request: Request) -> httpx.AsyncClient:
+    """app_client de una petición: conserva la IP del cliente original para el rate limit."""
+    client = request.client
+    return app_client(request.app, (client.host, client.port) if client else ("127.0.0.1", 0))
+
+
+def forwarded_headers(request: Request) -> Dict[str, str]:
+    headers = {name: request.headers[name] for name in FORWARDED_HEADERS if name in request.headers}
+    trace = getattr(request.state, "trace", None)
+    if trace is not None:
+        # las sub-peticiones cuelgan del span de la petición compuesta
+        headers["traceparent"] = trace.traceparent()
+    return headers
+
+
+def proxied(table: RouteTable, method: str, path: str) -> bool:
+    """
+    True si `path` es una ruta proxy de la tabla. Las sub-peticiones no
+    pueden llegar a los endpoints propios del gateway (/gateway/*, /metrics,
+    /batch, /bff/*) ni abrir un stream SSE (/stream/*): por el transporte
+    interno nunca llega la desconexión y la sesión quedaría abierta.
+    """
+    if not path.startswith("/") or path.startswith("//"):
+        return False
+    raw_path = urlsplit(path).path
+    match, _ = table.match(method, unquote(raw_path), raw_path)
+    return match is not None
+
+
+def decode_body(resp: httpx.Response) -> Any:
+    if not resp.content:
+        return None
+    if "json" in resp.headers.get("content-type", ""):
+        try:
+            return resp.json()
+        except ValueError:
+            pass
+    return resp.text
+
+
+# =====================================================
+#              AGREGADOS (BFF) DECLARATIVOS
+# =====================================================
+@dataclass(frozen=True)
+class Part:
+    """
+    Una sub-petición GET de un agregado. `path` es una ruta del gateway con
+    {param} de la URL del agregado. Con `depends_on`, la parte espera a otra
+    y `each` liga {param} a un campo de su resultado (una llamada por
+    elemento si es una lista; el resultado queda indexado por ese valor).
+    """
+    name: str
+    path: str
+    depends_on: Optional[str] = None
+    each: Dict[str, str] = field(default_factory=dict)
+    timeout: Optional[float] = None
+    # si falla una parte requerida el agregado responde 502
+    required: bool = False
+
+
+@dataclass(frozen=True)
+class Aggregate:
+    path: str
+    parts: Tuple[Part, ...]
+    name: str = ""
+
+
+def dependency_order(aggregate: Aggregate) -> List[str]:
+    """
+    Orden topológico de las partes por `depends_on`. ValueError si hay nombres
+    repetidos, dependencias a partes que no existen o ciclos: una parte de un
+    ciclo esperaría a su padre hasta el timeout en cada petición.
+    """
+    names = [part.name for part in aggregate.parts]
+    if len(set(names)) != len(names):
+        raise ValueError(f"{aggregate.path}: nombres de parte repetidos")
+    children: Dict[str, List[str]] = {name: [] for name in names}
+    pending: Dict[str, int] = {}
+    for part in aggregate.parts:
+        if part.depends_on is None:
+            continue
+        if part.depends_on not in children:
+            raise ValueError(f"{aggregate.path}: {part.name} depende de {part.depends_on}, que no existe")
+        children[part.depends_on].append(part.name)
+        pending[part.name] = 1
+    ready = [name for name in names if name not in pending]
+    order: List[str] = []
+    while ready:
+        name = ready.pop()
+        order.append(name)
+        for child in children[name]:
+            pending[child] -= 1
+            if not pending[child]:
+                ready.append(child)
+    if len(order) != len(names):
+        cycle = sorted(set(names) - set(order))
+        raise ValueError(f"{aggregate.path}: dependencias circulares entre {', '.join(cycle)}")
+    return order
+
+
+class PartError(Exception):
+    def __init__(self, status: int, detail: Any):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+def _fill(template: str, values: Dict[str, Any]) -> str:
+    return template.format_map({k: quote(str(v), safe="") for k, v in values.items()})
+
+
+async def _fetch(client: httpx.AsyncClient, path: str, headers: Dict[str, str], timeout: float) -> Any:
+    try:
+        resp = await asyncio.wait_for(client.get(path, headers=headers), timeout)
+    except asyncio.TimeoutError:
+        raise PartError(504, "Timeout de la parte")
+    body = decode_body(resp)
+    if resp.status_code >= 400:
+        raise PartError(resp.status_code, body)
+    return body
+
+
+class AggregateRun:
+    """
+    Ejecución de un agregado: cada parte es una tarea; las independientes
+    arrancan a la vez y las dependientes esperan solo a su parte padre.
+    """
+
+    def __init__(self, aggregate: Aggregate, client: httpx.AsyncClient, table: RouteTable,
+                 params: Dict[str, Any], headers: Dict[str, str]):
+        self.aggregate = aggregate
+        self.client = client
+        self.table = table
+        self.params = params
+        self.headers = headers
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.errors: Dict[str, dict] = {}
+
+    async def run(self) -> Dict[str, Any]:
+        for part in self.aggregate.parts:
+            self.tasks[part.name] = asyncio.create_task(self._run_part(part))
+        results = await asyncio.gather(*self.tasks.values())
+        return {
+            name: result for name, result in zip(self.tasks, results)
+            if name not in self.errors
+        }
+
+    async def _run_part(self, part: Part) -> Any:
+        timeout = part.timeout if part.timeout is not None else COMPOSE_PART_TIMEOUT
+        try:
+            if part.depends_on is None:
+                return await self._fetch(_fill(part.path, self.params), timeout)
+            try:
+                # shield: el timeout de una hija no cancela al padre que comparten otras
+                parent = await asyncio.wait_for(asyncio.shield(self.tasks[part.depends_on]),
+                                                self._ancestors_timeout(part.depends_on))
+            except asyncio.TimeoutError:
+                raise PartError(504, f"Timeout esperando a la parte {part.depends_on}")
+            if part.depends_on in self.errors:
+                raise PartError(424, f"Falló la parte {part.depends_on}")
+            return await self._run_each(part, parent, timeout)
+        except PartError as exc:
+            self.errors[part.name] = {"status": exc.status, "detail": exc.detail}
+            return None
+
+    def _ancestors_timeout(self, name: str) -> float:
+        """Lo que puede tardar la parte `name`: su timeout más el de sus ancestros."""
+        parts = {part.name: part for part in self.aggregate.parts}
+        total = 0.0
+        seen = set()
+        while name is not None and name in parts and name not in seen:
+            seen.add(name)
+            part = parts[name]
+            total += part.timeout if part.timeout is not None else COMPOSE_PART_TIMEOUT
+            name = part.depends_on
+        return total
+
+    async def _run_each(self, part: Part, parent: Any, timeout: float) -> Any:
+        if not isinstance(parent, list):
+            return await self._fetch(self._bind(part, parent), timeout)
+        items = [item for item in parent if isinstance(item, dict)]
+        paths = [self._bind(part, item) for item in items]
+        outcomes = await asyncio.gather(
+            *(self._fetch(path, timeout) for path in paths),
+            return_exceptions=True,
+        )
+        key_field = next(iter(part.each.values()))
+        results: Dict[str, Any] = {}
+        failed: Dict[str, dict] = {}
+        for item, outcome in zip(items, outcomes):
+            key = str(item.get(key_field))
+            if isinstance(outcome, PartError):
+                failed[key] = {"status": outcome.status, "detail": outcome.detail}
+            elif isinstance(outcome, BaseException):
+                raise outcome
+            else:
+                results[key] = outcome
+        if failed:
+            # resultado parcial: los elementos que fallaron van a errors
+            self.errors[f"{part.name}[]"] = failed
+        return results
+
+    async def _fetch(self, path: str, timeout: float) -> Any:
+        if not proxied(self.table, "GET", path):
+            raise PartError(400, "Path no permitido en un agregado")
+        return await _fetch(self.client, path, self.headers, timeout)
+
+    def _bind(self, part: Part, item: Any) -> str:
+        values = dict(self.params)
+        for param, source in part.each.items():
+            if not isinstance(item, dict) or item.get(source) is None:
+                raise PartError(424, f"Falta {source} en {part.depends_on}")
+            values[param] = item[source]
+        return _fill(part.path, values)
+
+
+async def run_aggregate(aggregate: Aggregate, request: Request, table: RouteTable) -> JSONResponse:
+    """
+    Ejecuta el agregado y une los resultados en un JSON. Las partes que fallan
+    o superan su timeout van a `errors` (respuesta parcial, 200 con
+    X-Partial-Response); si falla una parte requerida se responde 502.
+    """
+    async with internal_client(request) as client:
+        run = AggregateRun(aggregate, client, table, dict(request.path_params), forwarded_headers(request))
+        data = await run.run()
+
+    failed_required = [p.name for p in aggregate.parts if p.required and p.name in run.errors]
+    if failed_required:
+        return JSONResponse({"detail": "Falló una parte requerida", "errors": run.errors}, status_code=502)
+    headers = {}
+    if run.errors:
+        data["errors"] = run.errors
+        headers["X-Partial-Response"] = "true"
+    return JSONResponse(data, headers=headers)
+
+
+# =====================================================
+#                    POST /batch
+# =====================================================
+# headers de la sub-respuesta que no tienen sentido dentro del JSON del lote
+BATCH_DROPPED_HEADERS = {"content-length", "content-encoding", "transfer-encoding", "connection"}
+
+
+@dataclass(frozen=True)
+class BatchItem:
+    method: str
+    path: str
+    headers: Tuple[Tuple[str, str], ...] = ()
+    body: Any = None
+    id: Optional[str] = None
+
+    @property
+    def dedup_key(self) -> Optional[tuple]:
+        # solo los GET sin body son idénticos por método + path + headers
+        if self.method != "GET" or self.body is not None:
+            return None
+        return self.path, self.headers
+
+
+def batch_body(resp: httpx.Response) -> Dict[str, Any]:
+    content_type = resp.headers.get("content-type", "")
+    if not resp.content or "json" in content_type or content_type.startswith("text/"):
+        return {"body": decode_body(resp)}
+    return {"body": base64.b64encode(resp.content).decode("ascii"), "body_encoding": "base64"}
+
+
+class BatchRun:
+    """
+    Ejecuta las sub-peticiones de un lote con un solo cliente interno y
+    como mucho BATCH_CONCURRENCY a la vez. Los GET idénticos del lote se
+    ejecutan una vez y comparten la respuesta.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, table: RouteTable, base_headers: Dict[str, str]):
+        self.client = client
+        self.table = table
+        self.base_headers = base_headers
+        self.semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+        self.shared: Dict[tuple, asyncio.Task] = {}
+        self.deduplicated = 0
+
+    async def run(self, items: List[BatchItem]) -> List[Dict[str, Any]]:
+        tasks = []
+        for item in items:
+            key = item.dedup_key
+            if key is not None and key in self.shared:
+                self.deduplicated += 1
+                tasks.append(self.shared[key])
+                continue
+            task = asyncio.ensure_future(self._call(item))
+            if key is not None:
+                self.shared[key] = task
+            tasks.append(task)
+        results = await asyncio.gather(*tasks)
+        return [{"id": item.id, **result} for item, result in zip(items, results)]
+
+    async def _call(self, item: BatchItem) -> Dict[str, Any]:
+        if not proxied(self.table, item.method, item.path):
+            return {"status": 400, "headers": {}, "body": {"detail": "Path no permitido en un lote"}}
+        headers = {**self.base_headers, **dict(item.headers)}
+        kwargs: Dict[str, Any] = {}
+        if isinstance(item.body, str):
+            kwargs["content"] = item.body.encode()
+        elif item.body is not None:
+            kwargs["json"] = item.body
+        async with self.semaphore:
+            resp = await self.client.request(item.method, item.path, headers=headers, **kwargs)
+        return {
+            "status": resp.status_code,
+            "headers": {k: v for k, v in resp.headers.items() if k not in BATCH_DROPPED_HEADERS},
+            **batch_body(resp),
+        }
+
+
+async def run_batch(items: List[BatchItem], request: Request, table: RouteTable) -> JSONResponse:
+    if len(items) > BATCH_MAX_REQUESTS:
+        return JSONResponse(
+            {"detail": f"Máximo {BATCH_MAX_REQUESTS} peticiones por lote"}, status_code=413
+        )
+    async with internal_client(request) as client:
+        run = BatchRun(client, table, forwarded_headers(request))
+        responses = await run.run(items)
+    return JSONResponse(responses, headers={"X-Batch-Deduplicated": str(run.deduplicated)})
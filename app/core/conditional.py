@@ -0,0 +1,103 @@
+# core/conditional.py
+import hashlib
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Mapping, Optional, Set, Tuple
+
+from starlette.responses import Response
+
+from app.core.config import env_bool
+
+
+# ETag fuerte generado en el gateway para los GET 200 sin ETag del upstream
+ETAG_ENABLED = env_bool("ETAG_ENABLED", True)
+
+# headers condicionales de lectura: se evalúan en el gateway o se reenvían
+CONDITIONAL_HEADERS = ("if-none-match", "if-modified-since")
+CONDITIONAL_BYTES = frozenset(name.encode() for name in CONDITIONAL_HEADERS)
+
+# headers que conserva un 304 (RFC 9110 §15.4.5)
+NOT_MODIFIED_HEADERS = {
+    "etag", "cache-control", "vary", "date", "expires", "content-location", "last-modified", "age", "x-cache",
+}
+
+
+def generate_etag(body: bytes) -> str:
+    """Hash rápido (BLAKE2b, 128 bits) de los bytes que se reenvían."""
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def _opaque(tag: str) -> str:
+    return tag.strip().removeprefix("W/")
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    # comparación débil (RFC 9110): la compresión sirve el ETag como W/"..."
+    if if_none_match.strip() == "*":
+        return True
+    return _opaque(etag) in {_opaque(tag) for tag in if_none_match.split(",")}
+
+
+def is_not_modified(request_headers: Mapping[str, str], response_headers: Mapping[str, str]) -> bool:
+    """
+    If-None-Match tiene prioridad; If-Modified-Since solo se evalúa sin él
+    y si la respuesta trae Last-Modified.
+    """
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        etag = response_headers.get("etag")
+        return etag is not None and etag_matches(if_none_match, etag)
+    if_modified_since = request_headers.get("if-modified-since")
+    last_modified = response_headers.get("last-modified")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+
+
+def not_modified_response(headers: Mapping[str, str]) -> Response:
+    return Response(status_code=304, headers={k: v for k, v in headers.items() if k.lower() in NOT_MODIFIED_HEADERS})
+
+
+def without_conditionals(headers: List[Tuple[bytes, bytes]]) -> List[Tuple[bytes, bytes]]:
+    return [(key, value) for key, value in headers if key not in CONDITIONAL_BYTES]
+
+
+class ConditionalSupport:
+    """
+    Rutas cuyo upstream ya respondió con ETag o Last-Modified. En ellas los
+    condicionales del cliente se reenvían tal cual y el 304 lo decide el
+    upstream; en el resto el gateway evalúa con su propio ETag.
+    """
+
+    def __init__(self):
+        self._routes: Set[str] = set()
+
+    def reset(self) -> None:
+        self._routes.clear()
+
+    def learn(self, template: str, headers: Mapping[str, str]) -> None:
+        if "etag" in headers or "last-modified" in headers:
+            self._routes.add(template)
+
+    def supports(self, template: str) -> bool:
+        return template in self._routes
+
+    def stats(self) -> dict:
+        return {"enabled": ETAG_ENABLED, "upstream_conditional_routes": sorted(self._routes)}
+
+
+conditional_support = ConditionalSupport()
+
+
+def has_conditionals(headers: Mapping[str, str]) -> bool:
+    return any(name in headers for name in CONDITIONAL_HEADERS)
+
+
+def with_etag(status_code: int, headers: Dict[str, str], body: bytes) -> Optional[str]:
+    """ETag de la respuesta: el del upstream o uno generado (solo 200)."""
+    etag = headers.get("etag")
+    if etag is None and ETAG_ENABLED and status_code == 200:
+        etag = headers["etag"] = generate_etag(body)
+    return etag
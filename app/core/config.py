@@ -0,0 +1,115 @@
+# core/config.py
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+
+# =====================================================
+#               LECTURA DE VARIABLES DE ENTORNO
+# =====================================================
+def env_str(name: str, default: Optional[str] = None) -> Optional[str]:
+    value = os.getenv(name)
+    return value if value not in (None, "") else default
+
+
+def env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value not in (None, "") else default
+
+
+def env_list(name: str, default: Optional[List[str]] = None) -> List[str]:
+    value = os.getenv(name)
+    if value in (None, ""):
+        return list(default or [])
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def env_bool(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# =====================================================
+#                    UPSTREAMS
+# =====================================================
+# nombre lógico del upstream -> prefijo de sus variables de entorno
+# (USER usa AUTH_SERVICE_URL por compatibilidad con el despliegue actual)
+UPSTREAM_ENV_PREFIXES: Dict[str, str] = {
+    "user": "AUTH_SERVICE",
+    "inventory": "INVENTORY_SERVICE",
+    "services": "SERVICES_SERVICE",
+}
+
+# timeout total por defecto de cada upstream (el de httpx para user, 30s el resto)
+DEFAULT_TIMEOUTS: Dict[str, float] = {
+    "user": 5.0,
+    "inventory": 30.0,
+    "services": 30.0,
+}
+
+
+def env_prefix(name: str) -> str:
+    """Prefijo de variables de un upstream; los añadidos por fichero usan su nombre."""
+    return UPSTREAM_ENV_PREFIXES.get(name, name.upper())
+
+
+@dataclass
+class UpstreamConfig:
+    name: str
+    # una o varias instancias del servicio (<PREFIJO>_URL separado por comas)
+    urls: List[str]
+    timeout: float
+    connect_timeout: float
+    http2: bool
+    max_connections: int
+    max_keepalive_connections: int
+    keepalive_expiry: float
+    balancer: str
+    health_path: str
+    health_interval: float
+    health_timeout: float
+    unhealthy_threshold: int
+    healthy_threshold: int
+
+
+def load_upstream_config(name: str) -> UpstreamConfig:
+    """
+    Construye la configuración de un upstream a partir de <PREFIJO>_* y,
+    si no está definida, de los valores globales UPSTREAM_*.
+    """
+    prefix = env_prefix(name)
+    return UpstreamConfig(
+        name=name,
+        urls=env_list(f"{prefix}_URL"),
+        timeout=env_float(f"{prefix}_TIMEOUT", env_float("UPSTREAM_TIMEOUT", DEFAULT_TIMEOUTS.get(name, 30.0))),
+        connect_timeout=env_float(f"{prefix}_CONNECT_TIMEOUT", env_float("UPSTREAM_CONNECT_TIMEOUT", 5.0)),
+        http2=env_bool(f"{prefix}_HTTP2", env_bool("UPSTREAM_HTTP2", False)),
+        max_connections=env_int(f"{prefix}_MAX_CONNECTIONS", env_int("UPSTREAM_MAX_CONNECTIONS", 100)),
+        max_keepalive_connections=env_int(
+            f"{prefix}_MAX_KEEPALIVE", env_int("UPSTREAM_MAX_KEEPALIVE", 20)
+        ),
+        keepalive_expiry=env_float(
+            f"{prefix}_KEEPALIVE_EXPIRY", env_float("UPSTREAM_KEEPALIVE_EXPIRY", 5.0)
+        ),
+        balancer=env_str(f"{prefix}_BALANCER", env_str("UPSTREAM_BALANCER", "round_robin")),
+        health_path=env_str(f"{prefix}_HEALTH_PATH", env_str("HEALTHCHECK_PATH", "/health")),
+        health_interval=env_float(f"{prefix}_HEALTH_INTERVAL", env_float("HEALTHCHECK_INTERVAL", 5.0)),
+        health_timeout=env_float(f"{prefix}_HEALTH_TIMEOUT", env_float("HEALTHCHECK_TIMEOUT", 2.0)),
+        unhealthy_threshold=env_int(
+            f"{prefix}_UNHEALTHY_THRESHOLD", env_int("HEALTHCHECK_UNHEALTHY_THRESHOLD", 2)
+        ),
+        healthy_threshold=env_int(
+            f"{prefix}_HEALTHY_THRESHOLD", env_int("HEALTHCHECK_HEALTHY_THRESHOLD", 2)
+        ),
+    )
+
+
+def load_upstreams() -> Dict[str, UpstreamConfig]:
+    return {name: load_upstream_config(name) for name in UPSTREAM_ENV_PREFIXES}
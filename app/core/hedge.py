@@ -0,0 +1,95 @@
+# core/hedge.py
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from app.core.config import env_float, env_int
+from app.core.retry import RetryBudget
+from app.core.routing import Hedge
+
+
+# espera antes de la petición de cobertura mientras una ruta adaptativa no
+# tiene muestras suficientes, y espera mínima en cualquier caso
+HEDGE_DEFAULT_DELAY = env_float("HEDGE_DEFAULT_DELAY", 0.1)
+HEDGE_MIN_DELAY = env_float("HEDGE_MIN_DELAY", 0.005)
+# latencias recientes por ruta con las que se estima el percentil
+HEDGE_WINDOW = env_int("HEDGE_WINDOW", 200)
+HEDGE_MIN_SAMPLES = env_int("HEDGE_MIN_SAMPLES", 20)
+# presupuesto: coberturas <= HEDGE_BUDGET_MIN + HEDGE_BUDGET_RATIO * peticiones
+# en la ventana, para no duplicar la carga del upstream cuando va lento
+HEDGE_BUDGET_RATIO = env_float("HEDGE_BUDGET_RATIO", 0.05)
+HEDGE_BUDGET_MIN = env_int("HEDGE_BUDGET_MIN", 5)
+HEDGE_BUDGET_WINDOW = env_int("HEDGE_BUDGET_WINDOW", 10)
+
+# cada cuántas muestras se recalcula el percentil
+RECOMPUTE_EVERY = 10
+
+
+class LatencyWindow:
+    """Últimas HEDGE_WINDOW latencias de una ruta y su percentil (cacheado)."""
+
+    __slots__ = ("samples", "value", "_pending")
+
+    def __init__(self):
+        self.samples: Deque[float] = deque(maxlen=HEDGE_WINDOW)
+        self.value: Optional[float] = None
+        self._pending = 0
+
+    def observe(self, latency: float) -> None:
+        self.samples.append(latency)
+        self._pending += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        if len(self.samples) < HEDGE_MIN_SAMPLES:
+            return None
+        if self.value is None or self._pending >= RECOMPUTE_EVERY:
+            ordered = sorted(self.samples)
+            self.value = ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+            self._pending = 0
+        return self.value
+
+
+class Hedging:
+    """Esperas por ruta, presupuesto y contadores de las peticiones de cobertura."""
+
+    def __init__(self):
+        self.budget = RetryBudget(HEDGE_BUDGET_RATIO, HEDGE_BUDGET_MIN, HEDGE_BUDGET_WINDOW)
+        self.reset()
+
+    def reset(self) -> None:
+        self.windows: Dict[str, LatencyWindow] = {}
+        self.budget.reset()
+        self.hedged = 0
+        self.wins = 0
+        self.skipped = 0
+
+    def delay(self, template: str, hedge: Hedge) -> float:
+        if hedge.delay is not None:
+            return max(HEDGE_MIN_DELAY, hedge.delay)
+        window = self.windows.get(template)
+        value = window.percentile(hedge.percentile) if window is not None else None
+        return max(HEDGE_MIN_DELAY, value if value is not None else HEDGE_DEFAULT_DELAY)
+
+    def observe(self, template: str, latency: float) -> None:
+        window = self.windows.get(template)
+        if window is None:
+            window = self.windows[template] = LatencyWindow()
+        window.observe(latency)
+
+    def stats(self) -> dict:
+        budget = self.budget.stats()
+        return {
+            "hedged": self.hedged,
+            "wins": self.wins,
+            "skipped": self.skipped,
+            "budget_exhausted": budget["budget_exhausted"],
+            "window_requests": budget["window_requests"],
+            "window_hedges": budget["window_retries"],
+            "ratio": budget["ratio"],
+            "delays": {
+                template: round(window.value, 4) for template, window in self.windows.items()
+                if window.value is not None
+            },
+        }
+
+
+hedging = Hedging()
@@ -0,0 +1,213 @@
+# core/metrics.py
+import time
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import env_bool
+
+
+METRICS_ENABLED = env_bool("METRICS_ENABLED", True)
+
+# límites superiores (segundos) de los buckets de latencia
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+# rutas sin plantilla (404) se agrupan para no disparar la cardinalidad
+UNMATCHED_ROUTE = "<unmatched>"
+
+RouteKey = Tuple[str, str, str]  # (route, method, upstream)
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        # un contador por bucket + el de +Inf al final
+        self.counts: List[int] = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class RouteStats:
+    __slots__ = ("status", "duration", "upstream", "bytes_in", "bytes_out")
+
+    def __init__(self):
+        # peticiones por clase de status: índice 0 = 1xx ... 4 = 5xx
+        self.status: List[int] = [0] * 5
+        self.duration = Histogram()
+        self.upstream = Histogram()
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+
+class Metrics:
+    """
+    Registro de métricas del worker. El event loop es de un solo hilo, así que
+    registrar es sumar sobre dicts y listas sin locks (agregación por worker);
+    el coste en el hot path es de unos pocos microsegundos.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.routes: Dict[RouteKey, RouteStats] = {}
+        self.in_flight: Dict[Tuple[str, str], int] = {}
+
+    def begin(self, route: str, upstream: str) -> None:
+        key = (route, upstream)
+        self.in_flight[key] = self.in_flight.get(key, 0) + 1
+
+    def end(self, route: str, upstream: str) -> None:
+        key = (route, upstream)
+        self.in_flight[key] = self.in_flight.get(key, 1) - 1
+
+    def record(self, key: RouteKey, status: int, duration: float, upstream_latency,
+               bytes_in: int, bytes_out: int) -> None:
+        stats = self.routes.get(key)
+        if stats is None:
+            stats = self.routes[key] = RouteStats()
+        stats.status[min(max(status // 100, 1), 5) - 1] += 1
+        stats.duration.observe(duration)
+        if upstream_latency is not None:
+            stats.upstream.observe(upstream_latency)
+        stats.bytes_in += bytes_in
+        stats.bytes_out += bytes_out
+
+
+metrics = Metrics()
+
+
+# =====================================================
+#                 MIDDLEWARE ASGI
+# =====================================================
+class MetricsMiddleware:
+    """Mide cada petición; la ruta y la latencia upstream vienen de scope["state"]."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        state = scope.setdefault("state", {})
+        status = 500
+        bytes_in = 0
+        bytes_out = 0
+
+        async def receive_wrapper() -> Message:
+            nonlocal bytes_in
+            message = await receive()
+            if message["type"] == "http.request":
+                bytes_in += len(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status, bytes_out
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                bytes_out += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            route = state.get("route")
+            if route is not None:
+                template, upstream = route.template, route.upstream
+                if state.get("in_flight"):
+                    metrics.end(template, upstream)
+            else:
+                endpoint = scope.get("route")
+                template = getattr(endpoint, "path", None) or UNMATCHED_ROUTE
+                upstream = ""
+            metrics.record(
+                (template, scope["method"], upstream), status, time.perf_counter() - start,
+                state.get("upstream_latency"), bytes_in, bytes_out,
+            )
+
+
+# =====================================================
+#            EXPOSICIÓN EN FORMATO PROMETHEUS
+# =====================================================
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + "}"
+
+
+def _histogram_lines(name: str, labels: dict, histogram: Histogram) -> List[str]:
+    lines = []
+    cumulative = 0
+    for bound, count in zip(LATENCY_BUCKETS, histogram.counts):
+        cumulative += count
+        lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}")
+    lines.append(f'{name}_bucket{_labels(**labels, le="+Inf")} {histogram.count}')
+    lines.append(f"{name}_sum{_labels(**labels)} {histogram.total}")
+    lines.append(f"{name}_count{_labels(**labels)} {histogram.count}")
+    return lines
+
+
+def render(gauges: Dict[str, Tuple[str, str, List[Tuple[dict, float]]]]) -> str:
+    """
+    Texto de exposición de Prometheus. `gauges` añade series calculadas al
+    vuelo (pools, cache, breakers...): nombre -> (tipo, ayuda, [(labels, valor)]).
+    """
+    out: List[str] = []
+    routes = list(metrics.routes.items())
+
+    out += ["# HELP gateway_requests_total Peticiones por ruta, upstream y clase de status.",
+            "# TYPE gateway_requests_total counter"]
+    for (route, method, upstream), stats in routes:
+        for index, count in enumerate(stats.status):
+            if count:
+                labels = _labels(route=route, method=method, upstream=upstream, status=f"{index + 1}xx")
+                out.append(f"gateway_requests_total{labels} {count}")
+
+    out += ["# HELP gateway_request_duration_seconds Latencia total de la petición en el gateway.",
+            "# TYPE gateway_request_duration_seconds histogram"]
+    for (route, method, upstream), stats in routes:
+        out += _histogram_lines("gateway_request_duration_seconds",
+                                {"route": route, "method": method, "upstream": upstream}, stats.duration)
+
+    out += ["# HELP gateway_upstream_duration_seconds Latencia upstream hasta headers (con reintentos).",
+            "# TYPE gateway_upstream_duration_seconds histogram"]
+    for (route, method, upstream), stats in routes:
+        if stats.upstream.count:
+            out += _histogram_lines("gateway_upstream_duration_seconds",
+                                    {"route": route, "method": method, "upstream": upstream}, stats.upstream)
+
+    out += ["# HELP gateway_request_bytes_total Bytes de body recibidos de los clientes.",
+            "# TYPE gateway_request_bytes_total counter"]
+    for (route, method, upstream), stats in routes:
+        out.append(f"gateway_request_bytes_total{_labels(route=route, method=method, upstream=upstream)} {stats.bytes_in}")
+
+    out += ["# HELP gateway_response_bytes_total Bytes de body enviados a los clientes.",
+            "# TYPE gateway_response_bytes_total counter"]
+    for (route, method, upstream), stats in routes:
+        out.append(f"gateway_response_bytes_total{_labels(route=route, method=method, upstream=upstream)} {stats.bytes_out}")
+
+    out += ["# HELP gateway_in_flight_requests Peticiones proxy en curso.",
+            "# TYPE gateway_in_flight_requests gauge"]
+    for (route, upstream), value in metrics.in_flight.items():
+        out.append(f"gateway_in_flight_requests{_labels(route=route, upstream=upstream)} {value}")
+
+    for name, (kind, help_text, samples) in gauges.items():
+        out += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for labels, value in samples:
+            out.append(f"{name}{_labels(**labels) if labels else ''} {value}")
+    return "\n".join(out) + "\n"
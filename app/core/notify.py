@@ -0,0 +1,386 @@
+# core/notify.py
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set
+
+import httpx
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from starlette.types import Receive, Scope, Send
+
+from app.core.compose import app_client, decode_body, forwarded_headers, internal_client
+from app.core.config import env_float, env_int, env_str
+
+
+# cada cuánto se sondea el upstream por usuario suscrito (una vez para todas
+# sus sesiones) y cada cuánto se envía un heartbeat a las sesiones inactivas
+NOTIFY_POLL_INTERVAL = env_float("NOTIFY_POLL_INTERVAL", 5.0)
+NOTIFY_HEARTBEAT = env_float("NOTIFY_HEARTBEAT", 15.0)
+NOTIFY_POLL_TIMEOUT = env_float("NOTIFY_POLL_TIMEOUT", 5.0)
+# sondeos simultáneos por worker (tareas fijas, no una por usuario)
+NOTIFY_POLL_CONCURRENCY = env_int("NOTIFY_POLL_CONCURRENCY", 50)
+# conexiones SSE por worker y por usuario
+NOTIFY_MAX_SESSIONS = env_int("NOTIFY_MAX_SESSIONS", 20000)
+NOTIFY_MAX_SESSIONS_PER_USER = env_int("NOTIFY_MAX_SESSIONS_PER_USER", 10)
+# eventos pendientes por sesión: un cliente que no lee se desconecta
+NOTIFY_SESSION_QUEUE = env_int("NOTIFY_SESSION_QUEUE", 64)
+NOTIFY_SEND_TIMEOUT = env_float("NOTIFY_SEND_TIMEOUT", 10.0)
+# duración máxima de una conexión: al cerrarse el cliente SSE reconecta y la
+# suscripción vuelve a autorizarse; también acota una sesión cuyo transporte
+# nunca notifica la desconexión
+NOTIFY_MAX_LIFETIME = env_float("NOTIFY_MAX_LIFETIME", 3600.0)
+# campo que identifica una notificación; sin él se compara el contenido
+NOTIFY_ID_FIELD = env_str("NOTIFY_ID_FIELD", "Not_id")
+
+NOTIFY_TICK = 0.5
+HEARTBEAT = b": ping\n\n"
+TRACE_HEADERS = ("traceparent", "tracestate")
+
+SSE_HEADERS = [
+    (b"content-type", b"text/event-stream; charset=utf-8"),
+    # no-transform: el CompressionMiddleware no la bufferiza para comprimirla
+    (b"cache-control", b"no-cache, no-transform"),
+    (b"x-accel-buffering", b"no"),
+]
+
+
+def sse_event(event: str, data: Any, event_id: Optional[str] = None) -> bytes:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, separators=(',', ':'), ensure_ascii=False)}\n\n".encode()
+
+
+def item_key(item: Any) -> str:
+    if isinstance(item, dict) and item.get(NOTIFY_ID_FIELD) is not None:
+        return str(item[NOTIFY_ID_FIELD])
+    return json.dumps(item, sort_keys=True, separators=(",", ":"))
+
+
+def notification_event(item: Any) -> bytes:
+    event_id = None
+    if isinstance(item, dict) and item.get(NOTIFY_ID_FIELD) is not None:
+        event_id = str(item[NOTIFY_ID_FIELD]).replace("\n", "")
+    return sse_event("notificacion", item, event_id)
+
+
+# =====================================================
+#              SESIONES Y FEEDS POR USUARIO
+# =====================================================
+class Session:
+    """
+    Una conexión SSE: cola acotada de eventos y un future para despertar al
+    escritor. Sin tareas propias, así que una sesión inactiva cuesta muy poco.
+    """
+
+    __slots__ = ("pending", "waiter", "closed")
+
+    def __init__(self):
+        self.pending: Deque[bytes] = deque()
+        self.waiter: Optional[asyncio.Future] = None
+        self.closed = False
+
+    def push(self, event: bytes) -> bool:
+        """False si la cola está llena: el cliente no lee al ritmo que llegan."""
+        if self.closed:
+            return True
+        if len(self.pending) >= NOTIFY_SESSION_QUEUE:
+            return False
+        self.pending.append(event)
+        self._wake()
+        return True
+
+    def close(self, event: Optional[bytes] = None) -> None:
+        if event is not None:
+            self.pending.append(event)
+        self.closed = True
+        self._wake()
+
+    def _wake(self) -> None:
+        if self.waiter is not None and not self.waiter.done():
+            self.waiter.set_result(None)
+
+    async def next(self) -> Optional[bytes]:
+        """Siguiente evento; None cuando la sesión se ha cerrado."""
+        while not self.pending:
+            if self.closed:
+                return None
+            self.waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self.waiter
+            finally:
+                self.waiter = None
+        return self.pending.popleft()
+
+
+class Feed:
+    """
+    Sondeo compartido de un recurso (las notificaciones de un usuario) para
+    todas sus sesiones. Solo guarda las claves de lo ya visto y el ETag, no
+    las notificaciones.
+    """
+
+    __slots__ = ("path", "headers", "sessions", "seen", "etag", "next_poll", "polling")
+
+    def __init__(self, path: str, headers: Dict[str, str]):
+        self.path = path
+        # credenciales de la última sesión suscrita (el token más reciente)
+        self.headers = headers
+        self.sessions: Set[Session] = set()
+        self.seen: Set[str] = set()
+        self.etag: Optional[str] = None
+        self.next_poll = time.monotonic() + NOTIFY_POLL_INTERVAL
+        self.polling = False
+
+
+class NotificationHub:
+    """
+    Canal push de notificaciones. Cada sesión hace una sola petición
+    autenticada al suscribirse (la lista actual, que recibe como evento
+    `snapshot`); después el hub sondea una vez por usuario cada
+    NOTIFY_POLL_INTERVAL, con If-None-Match, y empuja a todas sus sesiones
+    solo las notificaciones nuevas. Los sondeos pasan por la propia app
+    (JWT, bulkhead, breaker, access log) como las partes de un agregado BFF.
+    """
+
+    def __init__(self):
+        self.feeds: Dict[str, Feed] = {}
+        self.sessions = 0
+        self._client: Optional[httpx.AsyncClient] = None
+        self._due: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self.reset()
+
+    def reset(self) -> None:
+        self.polls = 0
+        self.not_modified = 0
+        self.poll_errors = 0
+        self.pushed = 0
+        self.dropped_slow = 0
+        self.expired = 0
+        self.send_errors = 0
+        self.rejected = 0
+
+    async def start(self, app) -> None:
+        self.reset()
+        self.feeds = {}
+        self.sessions = 0
+        self._client = app_client(app, timeout=NOTIFY_POLL_TIMEOUT)
+        self._due = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._schedule())]
+        self._tasks += [asyncio.create_task(self._worker()) for _ in range(NOTIFY_POLL_CONCURRENCY)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for feed in list(self.feeds.values()):
+            self._close_feed(feed)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    # ----------------------- suscripción -----------------------
+    async def subscribe(self, request: Request, path: str):
+        """EventStream de la sesión, o la respuesta de error de la petición inicial."""
+        if self.sessions >= NOTIFY_MAX_SESSIONS:
+            self.rejected += 1
+            return JSONResponse({"detail": "Demasiadas conexiones de notificaciones"}, status_code=503,
+                                headers={"Retry-After": "5"})
+        headers = forwarded_headers(request)
+        async with internal_client(request) as client:
+            resp = await client.get(path, headers=headers)
+        body = decode_body(resp)
+        if resp.status_code >= 400:
+            # 401/403/404 del JWT o del upstream: la sesión no se abre
+            return JSONResponse(body, status_code=resp.status_code)
+        if not isinstance(body, list):
+            return JSONResponse({"detail": "El upstream no devolvió una lista de notificaciones"}, status_code=502)
+
+        # los sondeos no heredan la traza de la petición que abrió la sesión
+        headers = {name: value for name, value in headers.items() if name not in TRACE_HEADERS}
+        feed = self.feeds.get(path)
+        if feed is None:
+            feed = self.feeds[path] = Feed(path, headers)
+        elif len(feed.sessions) >= NOTIFY_MAX_SESSIONS_PER_USER:
+            self.rejected += 1
+            return JSONResponse({"detail": "Demasiadas conexiones para este usuario"}, status_code=429,
+                                headers={"Retry-After": "5"})
+        else:
+            feed.headers = headers
+        # la lista inicial también sirve de sondeo para las sesiones ya abiertas
+        self._publish(feed, body, replace=False)
+        session = Session()
+        feed.sessions.add(session)
+        self.sessions += 1
+        return EventStream(self, feed, session, sse_event("snapshot", body))
+
+    def unsubscribe(self, feed: Feed, session: Session) -> None:
+        if session not in feed.sessions:
+            return
+        feed.sessions.discard(session)
+        self.sessions -= 1
+        if not feed.sessions and self.feeds.get(feed.path) is feed:
+            del self.feeds[feed.path]
+
+    def _close_feed(self, feed: Feed, event: Optional[bytes] = None) -> None:
+        for session in list(feed.sessions):
+            session.close(event)
+            self.unsubscribe(feed, session)
+
+    # ----------------------- difusión -----------------------
+    def _publish(self, feed: Feed, items: List[Any], replace: bool) -> None:
+        """
+        Empuja a las sesiones del feed los elementos no vistos. Con replace
+        (un sondeo) las claves vistas pasan a ser las de la lista actual, así
+        el conjunto no crece más que la propia lista.
+        """
+        keys = [item_key(item) for item in items]
+        fresh = [item for key, item in zip(keys, items) if key not in feed.seen]
+        feed.seen = set(keys) if replace else feed.seen | set(keys)
+        if not fresh or not feed.sessions:
+            return
+        events = [notification_event(item) for item in fresh]
+        for session in list(feed.sessions):
+            if not self._push(session, events):
+                # back-pressure: se corta la sesión lenta en lugar de acumular
+                self.dropped_slow += 1
+                session.pending.clear()
+                session.close()
+                self.unsubscribe(feed, session)
+
+    def _push(self, session: Session, events: Iterable[bytes]) -> bool:
+        for event in events:
+            if not session.push(event):
+                return False
+            self.pushed += 1
+        return True
+
+    def _heartbeat(self) -> None:
+        for feed in self.feeds.values():
+            for session in feed.sessions:
+                if not session.pending:
+                    session.push(HEARTBEAT)
+
+    # ----------------------- sondeo -----------------------
+    async def _schedule(self) -> None:
+        next_heartbeat = time.monotonic() + NOTIFY_HEARTBEAT
+        while True:
+            await asyncio.sleep(NOTIFY_TICK)
+            now = time.monotonic()
+            for feed in self.feeds.values():
+                if not feed.polling and feed.next_poll <= now:
+                    feed.polling = True
+                    self._due.put_nowait(feed)
+            if now >= next_heartbeat:
+                self._heartbeat()
+                next_heartbeat = now + NOTIFY_HEARTBEAT
+
+    async def _worker(self) -> None:
+        while True:
+            feed = await self._due.get()
+            try:
+                if self.feeds.get(feed.path) is feed:
+                    await self._poll(feed)
+            except Exception:
+                self.poll_errors += 1
+            finally:
+                feed.polling = False
+                feed.next_poll = time.monotonic() + NOTIFY_POLL_INTERVAL
+
+    async def _poll(self, feed: Feed) -> None:
+        headers = dict(feed.headers)
+        if feed.etag is not None:
+            headers["if-none-match"] = feed.etag
+        self.polls += 1
+        try:
+            resp = await self._client.get(feed.path, headers=headers)
+        except httpx.HTTPError:
+            self.poll_errors += 1
+            return
+        if resp.status_code == 304:
+            self.not_modified += 1
+            return
+        if resp.status_code in (401, 403):
+            # token caducado o revocado: el cliente debe reconectar con uno nuevo
+            self._close_feed(feed, sse_event("error", {"status": resp.status_code}))
+            return
+        body = decode_body(resp)
+        if resp.status_code >= 400 or not isinstance(body, list):
+            self.poll_errors += 1
+            return
+        feed.etag = resp.headers.get("etag")
+        self._publish(feed, body, replace=True)
+
+    def stats(self) -> dict:
+        return {
+            "feeds": len(self.feeds),
+            "sessions": self.sessions,
+            "poll_interval": NOTIFY_POLL_INTERVAL,
+            "polls": self.polls,
+            "not_modified": self.not_modified,
+            "poll_errors": self.poll_errors,
+            "pushed": self.pushed,
+            "dropped_slow": self.dropped_slow,
+            "expired": self.expired,
+            "send_errors": self.send_errors,
+            "rejected": self.rejected,
+        }
+
+
+notification_hub = NotificationHub()
+
+
+# =====================================================
+#                  RESPUESTA SSE (ASGI)
+# =====================================================
+class EventStream:
+    """
+    Respuesta text/event-stream de una sesión. La desconexión del cliente se
+    comprueba tras cada heartbeat, sin una tarea de escucha por conexión; un
+    cliente que deja de leer se corta por cola llena o por NOTIFY_SEND_TIMEOUT.
+    La sesión termina también si un envío falla o al cumplir NOTIFY_MAX_LIFETIME.
+    """
+
+    __slots__ = ("hub", "feed", "session", "snapshot")
+
+    def __init__(self, hub: NotificationHub, feed: Feed, session: Session, snapshot: bytes):
+        self.hub = hub
+        self.feed = feed
+        self.session = session
+        self.snapshot = snapshot
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        request = Request(scope, receive)
+        retry = int(NOTIFY_POLL_INTERVAL * 1000)
+        deadline = time.monotonic() + NOTIFY_MAX_LIFETIME
+        try:
+            await send({"type": "http.response.start", "status": 200, "headers": SSE_HEADERS})
+            await send({"type": "http.response.body", "body": f"retry: {retry}\n\n".encode() + self.snapshot,
+                        "more_body": True})
+            while True:
+                event = await self.session.next()
+                if event is None:
+                    break
+                try:
+                    await asyncio.wait_for(
+                        send({"type": "http.response.body", "body": event, "more_body": True}), NOTIFY_SEND_TIMEOUT
+                    )
+                except asyncio.TimeoutError:
+                    self.hub.dropped_slow += 1
+                    return
+                except Exception:
+                    # conexión rota o servidor que rechaza el envío
+                    self.hub.send_errors += 1
+                    return
+                if event is HEARTBEAT:
+                    if await request.is_disconnected():
+                        return
+                    # el heartbeat despierta la sesión al menos cada NOTIFY_HEARTBEAT
+                    if time.monotonic() >= deadline:
+                        self.hub.expired += 1
+                        break
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            self.hub.unsubscribe(self.feed, self.session)
@@ -0,0 +1,668 @@
+# core/proxy.py
+import asyncio
+import math
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional, Set, Tuple, Union
+
+import anyio
+import httpx
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from starlette.types import Receive, Scope, Send
+
+from app.core.auth import identity_headers
+from app.core.balancer import Instance, NoInstanceError, track_response
+from app.core.body import (
+    BodyTooLargeError,
+    SpooledBody,
+    body_limit,
+    body_spool,
+    check_content_length,
+    limited_stream,
+    read_limited,
+)
+from app.core.breaker import CircuitOpenError
+from app.core.bulkhead import BulkheadRejectedError
+from app.core.cache import CACHE_ENABLED, CacheEntry, request_bypasses_cache, resource_of, response_cache, response_ttl
+from app.core.conditional import (
+    ETAG_ENABLED,
+    conditional_support,
+    has_conditionals,
+    is_not_modified,
+    not_modified_response,
+    with_etag,
+    without_conditionals,
+)
+from app.core.config import UpstreamConfig, env_bool
+from app.core.hedge import hedging
+from app.core.metrics import metrics
+from app.core.retry import (
+    FAILOVER_ERRORS,
+    RETRY_MAX_BODY_BYTES,
+    RETRY_MAX_RETRIES,
+    RETRYABLE_ERRORS,
+    RETRYABLE_METHODS,
+    RETRYABLE_STATUS,
+    backoff,
+    retry_budget,
+)
+from app.core.routing import Route, RouteMatch
+from app.core.singleflight import SINGLEFLIGHT_ENABLED, SINGLEFLIGHT_MAX_BYTES, flight_key, single_flight
+from app.core.runtime import GatewayRuntime, resolve
+from app.core.tracing import RequestTrace, new_id
+from app.core.upstreams import Upstream, mark_failure
+
+
+# Modo streaming: el body se reenvía por chunks en ambos sentidos y la
+# memoria del gateway no depende del tamaño del payload.
+STREAMING_ENABLED = env_bool("GATEWAY_STREAMING", True)
+
+HOP_BY_HOP_HEADERS = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "te",
+    "trailers",
+    "transfer-encoding",
+    "upgrade",
+}
+
+# Los headers viajan como pares de bytes, tal como llegan en scope["headers"]
+# y salen en http.response.start: se filtran contra conjuntos precalculados
+# sin decodificar ni reconstruir dicts. host lo pone httpx según el upstream y
+# traceparent se genera por intento.
+RawHeaders = List[Tuple[bytes, bytes]]
+HOP_BY_HOP_BYTES = frozenset(name.encode() for name in HOP_BY_HOP_HEADERS)
+REQUEST_EXCLUDED_BYTES = HOP_BY_HOP_BYTES | {b"host", b"traceparent"}
+
+# respuestas con content-length mayor (o desconocido) vigilan la desconexión
+# del cliente para dejar de leer del upstream
+STREAM_WATCH_BYTES = 64 * 1024
+
+
+class UpstreamStreamingResponse:
+    """
+    Respuesta ASGI sobre los bytes crudos del upstream: escribe
+    http.response.start y cada chunk directamente, sin StreamingResponse (ni
+    su task group por respuesta). Cierra la respuesta upstream (y devuelve la
+    conexión al pool) al terminar, aunque el cliente se desconecte a mitad.
+    """
+
+    __slots__ = ("upstream", "status_code", "raw_headers", "content")
+
+    def __init__(self, upstream: httpx.Response, headers: RawHeaders,
+                 content: Optional[AsyncIterator[bytes]] = None):
+        self.upstream = upstream
+        self.status_code = upstream.status_code
+        self.raw_headers = headers
+        self.content = content or upstream.aiter_raw()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        length = self.upstream.headers.get("content-length", "")
+        watcher = None
+        if not length.isdigit() or int(length) > STREAM_WATCH_BYTES:
+            watcher = asyncio.ensure_future(_wait_disconnect(receive))
+        try:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            async for chunk in self.content:
+                if watcher is not None and watcher.done():
+                    return
+                if chunk:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+            with anyio.CancelScope(shield=True):
+                await self.upstream.aclose()
+
+
+class RawResponse:
+    """Respuesta ASGI ya en memoria con headers en bytes."""
+
+    __slots__ = ("status_code", "raw_headers", "body")
+
+    def __init__(self, status_code: int, headers: RawHeaders, body: bytes):
+        self.status_code = status_code
+        self.raw_headers = [*headers, (b"content-length", str(len(body)).encode())]
+        self.body = body
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        await send({"type": "http.response.body", "body": self.body})
+
+
+async def _wait_disconnect(receive: Receive) -> None:
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+def has_body(request: Request) -> bool:
+    return "content-length" in request.headers or "transfer-encoding" in request.headers
+
+
+def request_headers(scope: Scope) -> RawHeaders:
+    headers = [(key, value) for key, value in scope["headers"] if key not in REQUEST_EXCLUDED_BYTES]
+    # X-User-* del cliente fuera siempre; solo viajan los de un JWT verificado
+    return identity_headers(headers, scope.get("state", {}).get("identity"))
+
+
+def response_headers(resp: httpx.Response, exclude: frozenset = HOP_BY_HOP_BYTES) -> RawHeaders:
+    # h11 y h2 ya entregan los nombres en minúsculas; lower() cubre otros transportes
+    return [(key, value) for name, value in resp.headers.raw if (key := name.lower()) not in exclude]
+
+
+def upstream_url(match: RouteMatch, request: Request) -> str:
+    query = request.url.query
+    return f"{match.upstream_path}?{query}" if query else match.upstream_path
+
+
+async def _chain(head: List[bytes], tail: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    for chunk in head:
+        yield chunk
+    async for chunk in tail:
+        yield chunk
+
+
+# =====================================================
+#                 MOTOR DE REENVÍO
+# =====================================================
+def route_timeout(route: Route, config: UpstreamConfig) -> Optional[httpx.Timeout]:
+    """Timeout por fase de la ruta; lo no definido hereda el del upstream."""
+    timeouts = route.timeouts
+    if timeouts is None:
+        return None
+
+    def pick(value: Optional[float], default: float) -> float:
+        return value if value is not None else default
+
+    return httpx.Timeout(
+        connect=pick(timeouts.connect, config.connect_timeout),
+        read=pick(timeouts.read, config.timeout),
+        write=pick(timeouts.write, config.timeout),
+        pool=pick(timeouts.pool, config.timeout),
+    )
+
+
+async def request_body(request: Request, headers: RawHeaders, route: Route, want_replay: bool):
+    """
+    Devuelve (body, headers, reintentable). En streaming solo se guarda en
+    memoria el body de peticiones reintentables y pequeñas (content-length
+    conocido <= RETRY_MAX_BODY_BYTES). Las rutas con spool=True (uploads)
+    leen el body entero antes de contactar al upstream, en memoria o en
+    disco, para poder repetirlo. El resto se reenvía por chunks sin
+    reintentos. En todos los casos se corta con 413 al pasar Route.max_body.
+    """
+    limit = body_limit(route.max_body)
+    if not STREAMING_ENABLED:
+        # httpx recalcula content-length a partir del body ya leído
+        headers = [(key, value) for key, value in headers if key != b"content-length"]
+        return await read_limited(request, limit), headers, True
+    if not has_body(request):
+        return None, headers, True
+    length = request.headers.get("content-length", "")
+    if want_replay and length.isdigit() and int(length) <= RETRY_MAX_BODY_BYTES:
+        return await request.body(), headers, True
+    if route.spool:
+        body = await body_spool.spool(request, limit)
+        # tamaño exacto: el upstream recibe content-length aunque el cliente
+        # enviara chunked
+        headers = [(key, value) for key, value in headers if key != b"content-length"]
+        headers.append((b"content-length", str(body.size).encode()))
+        return body, headers, True
+    # el resto de bodies pasan por chunks, sin bufferizar
+    return limited_stream(request, limit), headers, False
+
+
+async def send_upstream(request: Request, url: str, headers: RawHeaders) -> httpx.Response:
+    """
+    Envía la petición a una instancia del upstream elegida por el balanceador
+    y devuelve la respuesta aún sin leer. GET/PUT/DELETE se reintentan en otra
+    instancia ante errores de conexión o 502/503/504, con backoff con jitter y
+    dentro del presupuesto global de reintentos. Los GET con Route.hedge
+    lanzan además una petición de cobertura si el intento tarda (send_hedged).
+    """
+    route = request.state.route
+    # upstreams fijados al resolver la ruta: una recarga no cambia los de una
+    # petición en curso
+    upstream = request.state.snapshot.upstreams[route.upstream]
+    breaker = upstream.breaker
+    group = upstream.group
+    timeout = route_timeout(route, upstream.config)
+
+    # POST/PATCH con body reproducible: solo failover si no se llegó a conectar
+    failover_only = request.method not in RETRYABLE_METHODS
+    max_retries = 0
+    if not failover_only or route.spool:
+        max_retries = route.retries if route.retries is not None else RETRY_MAX_RETRIES
+    body, headers, replayable = await request_body(request, headers, route, max_retries > 0)
+    if not replayable:
+        max_retries = 0
+    hedged = route.hedge is not None and request.method == "GET"
+    if hedged:
+        hedging.budget.record_request()
+
+    retry_budget.record_request()
+    instance = None
+    retry = 0
+    start = time.perf_counter()
+    try:
+        while True:
+            # primero la instancia: si no hay ninguna (NoInstanceError) no se
+            # ocupa una prueba half-open del breaker que nadie liberaría
+            instance = group.pick(exclude=instance)
+            request.state.upstream_instance = instance.url
+            content = body.content() if isinstance(body, SpooledBody) else body
+            breaker.before_request()
+            try:
+                if hedged:
+                    resp, instance = await send_hedged(upstream, instance, request, url, headers, timeout, retry)
+                    request.state.upstream_instance = instance.url
+                else:
+                    resp = await send_attempt(
+                        upstream, instance, request.method, f"{instance.url}{url}", headers, content, timeout,
+                        route.priority, request.state.trace, retry,
+                    )
+            except RETRYABLE_ERRORS as exc:
+                if (retry >= max_retries or (failover_only and not isinstance(exc, FAILOVER_ERRORS))
+                        or not retry_budget.try_acquire()):
+                    raise
+            else:
+                if (resp.status_code not in RETRYABLE_STATUS or failover_only or retry >= max_retries
+                        or not retry_budget.try_acquire()):
+                    # latencia upstream hasta headers, incluidos reintentos (access log)
+                    request.state.upstream_latency = time.perf_counter() - start
+                    return resp
+                await resp.aclose()
+            await asyncio.sleep(backoff(retry))
+            retry += 1
+    finally:
+        # con la respuesta ya en headers el body se envió entero
+        if isinstance(body, SpooledBody):
+            body.close()
+
+
+class AttemptTimer:
+    """
+    Extensión "trace" de httpcore: marca cuándo empiezan a enviarse los
+    headers. Antes de ese instante está la espera de conexión del pool y el
+    connect/TLS (conn); desde él hasta los headers de respuesta, el TTFB.
+    """
+
+    __slots__ = ("sent_at",)
+
+    def __init__(self):
+        self.sent_at: Optional[float] = None
+
+    async def __call__(self, event: str, info: dict) -> None:
+        if self.sent_at is None and event.endswith("send_request_headers.started"):
+            self.sent_at = time.perf_counter()
+
+
+def record_attempt(trace: RequestTrace, span_id: str, upstream: Upstream, instance: Instance, method: str,
+                   timer: AttemptTimer, start: float, end: float, status: Optional[int], retry: int) -> None:
+    sent_at = timer.sent_at if timer.sent_at is not None else start
+    trace.add("conn", sent_at - start)
+    trace.add("ttfb", end - sent_at)
+    trace.client_span(span_id, f"{method} {upstream.config.name}", start, end, {
+        "server.address": instance.url,
+        "http.request.method": method,
+        "http.response.status_code": status,
+        "http.request.resend_count": retry or None,
+        "gateway.conn_ms": round((sent_at - start) * 1000, 3),
+    }, status is None or status >= 500)
+
+
+async def send_attempt(upstream: Upstream, instance: Instance, method: str,
+                       url: str, headers: RawHeaders, content, timeout, priority: str,
+                       trace: RequestTrace, retry: int = 0) -> httpx.Response:
+    """
+    Un intento contra una instancia, dentro del bulkhead del upstream. El
+    circuit breaker registra el resultado (5xx o error de transporte = fallo)
+    y la latencia hasta headers; la traza, la espera en cola, conn y TTFB.
+    """
+    client = upstream.client
+    breaker = upstream.breaker
+    bulkhead = upstream.bulkhead
+    queued_at = time.perf_counter()
+    try:
+        await bulkhead.acquire(priority)
+    except BaseException:
+        breaker.release()
+        raise
+    trace.add("queue", time.perf_counter() - queued_at)
+    # cada intento es un span hijo: el upstream recibe su id como padre
+    span_id = new_id(64)
+    timer = AttemptTimer()
+    kwargs = {"timeout": timeout} if timeout is not None else {}
+    upstream_request = client.build_request(
+        method, url, content=content, headers=[*headers, (b"traceparent", trace.traceparent(span_id).encode())],
+        extensions={"trace": timer}, **kwargs
+    )
+    start = time.perf_counter()
+    instance.acquire()
+
+    def release() -> None:
+        instance.release()
+        bulkhead.release()
+
+    try:
+        resp = await client.send(upstream_request, stream=True)
+    except httpx.TransportError:
+        release()
+        end = time.perf_counter()
+        record_attempt(trace, span_id, upstream, instance, method, timer, start, end, None, retry)
+        mark_failure(upstream.config, instance)
+        breaker.record(False, end - start)
+        raise
+    except BaseException:
+        release()
+        breaker.release()
+        raise
+    # la instancia y el hueco del bulkhead quedan ocupados hasta que se
+    # cierre el body de la respuesta
+    track_response(resp, release)
+    end = time.perf_counter()
+    record_attempt(trace, span_id, upstream, instance, method, timer, start, end, resp.status_code, retry)
+    breaker.record(resp.status_code < 500, end - start)
+    return resp
+
+
+# =====================================================
+#           HEDGING: PETICIÓN DE COBERTURA EN GET
+# =====================================================
+def hedge_target(upstream: Upstream, instance: Instance) -> Optional[Instance]:
+    """
+    Otra instancia para la cobertura, o None si no hay, si el breaker no
+    admite otra llamada o si el presupuesto de coberturas está agotado.
+    """
+    try:
+        target = upstream.group.pick(exclude=instance)
+    except NoInstanceError:
+        return None
+    if target is instance:
+        return None
+    try:
+        upstream.breaker.before_request()
+    except CircuitOpenError:
+        return None
+    if not hedging.budget.try_acquire():
+        upstream.breaker.release()
+        return None
+    return target
+
+
+async def send_hedged(upstream: Upstream, instance: Instance, request: Request, url: str,
+                      headers: RawHeaders, timeout, retry: int) -> Tuple[httpx.Response, Instance]:
+    """
+    GET contra `instance`; si no ha respondido en la espera de la ruta (fija
+    o el percentil observado) se lanza el mismo GET contra otra instancia y
+    gana la primera respuesta. La otra petición se cancela: httpx cierra su
+    conexión y se liberan su hueco del bulkhead y la instancia. Un error
+    solo se devuelve si fallan las dos.
+    """
+    route = request.state.route
+    trace = request.state.trace
+
+    # intentos que llegaron a ejecutarse: uno cancelado antes de arrancar no
+    # pasa por send_attempt y su hueco del breaker se libera aquí
+    started: Set[asyncio.Task] = set()
+
+    async def run_attempt(target: Instance) -> httpx.Response:
+        started.add(asyncio.current_task())
+        return await send_attempt(
+            upstream, target, "GET", f"{target.url}{url}", headers, None, timeout, route.priority, trace, retry,
+        )
+
+    def attempt(target: Instance) -> asyncio.Task:
+        return asyncio.ensure_future(run_attempt(target))
+
+    start = time.perf_counter()
+    primary = attempt(instance)
+    tasks = {primary: instance}
+    winner = error = None
+    # latencia del primer intento, gane o no: si solo se midiera la del
+    # ganador, el percentil (y con él la espera) bajaría con cada cobertura
+    primary_latency: Optional[float] = None
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=hedging.delay(route.template, route.hedge))
+        if not done:
+            target = hedge_target(upstream, instance)
+            if target is None:
+                hedging.skipped += 1
+            else:
+                hedging.hedged += 1
+                tasks[attempt(target)] = target
+        pending = set(tasks)
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                exc = task.exception()
+                if task is primary and exc is None:
+                    primary_latency = time.perf_counter() - start
+                if exc is not None:
+                    error = error or exc
+                elif winner is None:
+                    winner = task
+                else:
+                    # las dos respondieron a la vez: se descarta la segunda
+                    await task.result().aclose()
+    finally:
+        if not primary.done():
+            # cancelado por la cobertura: tardaba al menos hasta ahora (valor censurado)
+            primary_latency = time.perf_counter() - start
+        for task in tasks:
+            if task.cancel() and task not in started:
+                upstream.breaker.release()
+    if primary_latency is not None:
+        hedging.observe(route.template, primary_latency)
+    if winner is None:
+        raise error
+    if tasks[winner] is not instance:
+        hedging.wins += 1
+    return winner.result(), tasks[winner]
+
+
+# el body bufferizado lleva su propio content-length
+BUFFERED_EXCLUDED_BYTES = HOP_BY_HOP_BYTES | {b"content-length"}
+
+
+async def relay_response(resp: httpx.Response):
+    """Devuelve la respuesta upstream al cliente (streaming o bufferizada)."""
+    if STREAMING_ENABLED:
+        return UpstreamStreamingResponse(resp, response_headers(resp))
+    try:
+        # bytes crudos: content-encoding del upstream se conserva tal cual
+        content = b"".join([chunk async for chunk in resp.aiter_raw()])
+    finally:
+        await resp.aclose()
+    return RawResponse(resp.status_code, response_headers(resp, BUFFERED_EXCLUDED_BYTES), content)
+
+
+async def forward_request(match: RouteMatch, request: Request) -> Response:
+    """
+    Reenvía la petición al upstream de la ruta y retorna la Response adecuada.
+    Preserva headers, query string y el body crudo (útil para JSON y multipart).
+    """
+    route = match.route
+    url = upstream_url(match, request)
+    headers = request_headers(request.scope)
+    if request.method != "GET":
+        check_content_length(request, body_limit(route.max_body))
+
+    if request.method == "GET":
+        return await forward_get(match, request, url, headers)
+
+    resp = await send_upstream(request, url, headers)
+    if request.method in MUTATING_METHODS:
+        # una escritura sobre el recurso invalida sus GET cacheados
+        response_cache.invalidate(resource_of(route.prefix, match.upstream_path))
+    return await relay_response(resp)
+
+
+# =====================================================
+#          GET: CACHE DE RESPUESTAS + SINGLE-FLIGHT
+# =====================================================
+MUTATING_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+@dataclass
+class UpstreamBody:
+    """Respuesta upstream ya leída en memoria, compartible entre peticiones."""
+    status_code: int
+    headers: httpx.Headers
+    body: bytes
+
+
+def cached_response(entry: CacheEntry, request: Request) -> Response:
+    headers = dict(entry.headers)
+    headers["age"] = str(int(time.monotonic() - entry.stored_at))
+    headers["x-cache"] = "HIT"
+    if is_not_modified(request.headers, headers):
+        return not_modified_response(headers)
+    return Response(content=entry.body, status_code=entry.status_code, headers=headers)
+
+
+async def fetch_buffered(request: Request, url: str, headers: RawHeaders,
+                         limit: int) -> Union[UpstreamBody, Response]:
+    """
+    Lee la respuesta upstream en memoria si no supera `limit` bytes. Si lo
+    supera, devuelve una StreamingResponse con lo leído + el resto, de modo
+    que la memoria sigue acotada.
+    """
+    resp = await send_upstream(request, url, headers)
+    chunks: List[bytes] = []
+    size = 0
+    raw = resp.aiter_raw()
+    start = time.perf_counter()
+    async for chunk in raw:
+        chunks.append(chunk)
+        size += len(chunk)
+        if size > limit:
+            return UpstreamStreamingResponse(resp, response_headers(resp), content=_chain(chunks, raw))
+    await resp.aclose()
+    # lectura del body upstream antes de responder (en streaming va en transfer)
+    request.state.trace.add("body", time.perf_counter() - start)
+    return UpstreamBody(status_code=resp.status_code, headers=resp.headers, body=b"".join(chunks))
+
+
+async def forward_get(match: RouteMatch, request: Request, url: str,
+                      headers: RawHeaders) -> Response:
+    """
+    GET: sirve desde la cache si la ruta tiene cache_ttl y hay entrada vigente.
+    Si no, las peticiones idénticas concurrentes comparten una única llamada
+    upstream (single-flight) y el resultado se guarda en la cache cuando
+    Cache-Control lo permite. If-None-Match / If-Modified-Since se reenvían
+    si el upstream de la ruta maneja ETags; si no, se evalúan en el gateway
+    con un ETag fuerte generado sobre el body.
+    """
+    route = match.route
+    cacheable = CACHE_ENABLED and route.cache_ttl is not None
+    cache_key = response_cache.key_for(request) if cacheable else None
+    if cacheable and not request_bypasses_cache(request):
+        entry = response_cache.get(cache_key)
+        if entry is not None:
+            return cached_response(entry, request)
+
+    if has_conditionals(request.headers) and conditional_support.supports(route.template):
+        # el upstream responde 304 por sí mismo: condicional directo, sin compartir
+        return await relay_response(await send_upstream(request, url, headers))
+    # la respuesta compartida (cache / single-flight) siempre es completa
+    headers = without_conditionals(headers)
+
+    if not (cacheable or SINGLEFLIGHT_ENABLED or ETAG_ENABLED):
+        return await relay_response(await send_upstream(request, url, headers))
+
+    def fetch():
+        return fetch_buffered(request, url, headers, SINGLEFLIGHT_MAX_BYTES)
+
+    if SINGLEFLIGHT_ENABLED:
+        outcome, _ = await single_flight.run(
+            flight_key(request), fetch, share=lambda result: isinstance(result, UpstreamBody)
+        )
+        if outcome is None:
+            # el líder no pudo compartir (body grande o cancelado): petición propia
+            outcome = await fetch()
+    else:
+        outcome = await fetch()
+
+    if not isinstance(outcome, UpstreamBody):
+        # body grande en streaming: sin ETag propio
+        if isinstance(outcome, UpstreamStreamingResponse):
+            conditional_support.learn(route.template, outcome.upstream.headers)
+        return outcome
+
+    out_headers = {k: v for k, v in outcome.headers.items() if k.lower() not in HOP_BY_HOP_HEADERS}
+    conditional_support.learn(route.template, out_headers)
+    etag = with_etag(outcome.status_code, out_headers, outcome.body)
+    if cacheable:
+        ttl = response_ttl(route.cache_ttl, outcome.status_code, outcome.headers)
+        if ttl is not None:
+            now = time.monotonic()
+            response_cache.put(cache_key, CacheEntry(
+                status_code=outcome.status_code,
+                headers=dict(out_headers),
+                body=outcome.body,
+                etag=etag,
+                stored_at=now,
+                expires_at=now + ttl,
+                resource=resource_of(route.prefix, match.upstream_path),
+            ))
+            out_headers["x-cache"] = "MISS"
+    if outcome.status_code == 200 and is_not_modified(request.headers, out_headers):
+        return not_modified_response(out_headers)
+    return Response(content=outcome.body, status_code=outcome.status_code, headers=out_headers)
+
+
+async def dispatch(runtime: GatewayRuntime, request: Request) -> Response:
+    """Resuelve la ruta en el trie vigente y la reenvía; 404/405 si no existe."""
+    # normalmente los middlewares ya la resolvieron: se reutiliza su match
+    match, allowed = resolve(runtime, request.scope)
+    if match is None:
+        if allowed:
+            return JSONResponse(
+                {"detail": "Method Not Allowed"}, status_code=405, headers={"Allow": ", ".join(allowed)}
+            )
+        return JSONResponse({"detail": "Not Found"}, status_code=404)
+    request.state.route = match.route
+    # el MetricsMiddleware cierra el gauge al terminar la respuesta
+    metrics.begin(match.route.template, match.route.upstream)
+    request.state.in_flight = True
+    try:
+        return await forward_request(match, request)
+    except CircuitOpenError as exc:
+        # fallo rápido mientras el upstream se recupera
+        return JSONResponse(
+            {"detail": str(exc)},
+            status_code=503,
+            headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+        )
+    except NoInstanceError as exc:
+        return JSONResponse({"detail": str(exc)}, status_code=503)
+    except BodyTooLargeError as exc:
+        return JSONResponse({"detail": str(exc)}, status_code=413, headers={"Connection": "close"})
+    except BulkheadRejectedError as exc:
+        # descarte temprano: mejor un 503 rápido que esperar a un upstream saturado
+        return JSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": "1"})
+    except httpx.TimeoutException:
+        return JSONResponse({"detail": f"Timeout del upstream '{match.route.upstream}'"}, status_code=504)
+    except httpx.TransportError:
+        return JSONResponse({"detail": f"Upstream '{match.route.upstream}' no disponible"}, status_code=502)
+
+
+class ProxyApp:
+    """
+    Proxy ASGI puro, montado bajo los prefijos de servicio: las peticiones
+    proxy no pasan por el routing, la inyección de dependencias ni la
+    serialización de respuestas de FastAPI. El Request solo envuelve el
+    scope (headers y body se leen bajo demanda).
+    """
+
+    def __init__(self, runtime: GatewayRuntime):
+        self.runtime = runtime
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        response = await dispatch(self.runtime, Request(scope, receive))
+        await response(scope, receive, send)
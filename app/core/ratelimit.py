@@ -0,0 +1,260 @@
+# core/ratelimit.py
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import env_bool, env_int, env_list, env_str
+from app.core.routing import RateLimit
+from app.core.runtime import GatewayRuntime, resolve
+
+
+RATE_LIMIT_ENABLED = env_bool("RATE_LIMIT_ENABLED", True)
+# memory (por worker) o redis (compartido entre workers; requiere `pip install redis`)
+RATE_LIMIT_STORE = env_str("RATE_LIMIT_STORE", "memory")
+RATE_LIMIT_REDIS_URL = env_str("RATE_LIMIT_REDIS_URL", "redis://127.0.0.1:6379/0")
+RATE_LIMIT_MAX_KEYS = env_int("RATE_LIMIT_MAX_KEYS", 100000)
+# API keys conocidas: solo estas identifican al cliente con key="api_key"; una
+# clave arbitraria no da un bucket nuevo
+RATE_LIMIT_API_KEYS = frozenset(env_list("RATE_LIMIT_API_KEYS"))
+
+
+@dataclass
+class Decision:
+    allowed: bool
+    remaining: int
+    # segundos hasta poder hacer la siguiente petición (si allowed es False)
+    retry_after: float
+    # segundos hasta que el bucket vuelva a estar lleno
+    reset: float
+
+
+def _decision(allowed: bool, tokens: float, rate: float, burst: int) -> Decision:
+    return Decision(
+        allowed=allowed,
+        remaining=max(0, int(tokens)),
+        retry_after=0.0 if allowed else (1 - tokens) / rate,
+        reset=(burst - tokens) / rate,
+    )
+
+
+# =====================================================
+#              ALMACENES DE BUCKETS
+# =====================================================
+class MemoryBucketStore:
+    """
+    Token buckets en memoria del worker. Cada consulta es O(1): el bucket se
+    rellena de forma perezosa con el tiempo transcurrido. Las claves están en
+    orden LRU; un bucket inactivo más tiempo del que tarda en llenarse equivale
+    a uno nuevo, así que se expulsa (como mucho dos por consulta) y el total
+    nunca supera max_keys.
+    """
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        # clave -> [tokens, último acceso, segundos hasta llenarse]
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+        self.evicted = 0
+
+    async def take(self, key: str, rate: float, burst: int) -> Decision:
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            tokens = float(burst)
+            bucket = self._buckets[key] = [tokens, now, burst / rate]
+        else:
+            tokens = min(float(burst), bucket[0] + (now - bucket[1]) * rate)
+            self._buckets.move_to_end(key)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        bucket[0], bucket[1] = tokens, now
+        self._evict(now)
+        return _decision(allowed, tokens, rate, burst)
+
+    def _evict(self, now: float) -> None:
+        for _ in range(2):
+            oldest_key = next(iter(self._buckets))
+            oldest = self._buckets[oldest_key]
+            if len(self._buckets) > self.max_keys or now - oldest[1] >= oldest[2]:
+                del self._buckets[oldest_key]
+                self.evicted += 1
+            else:
+                break
+
+    async def close(self) -> None:
+        self._buckets.clear()
+
+    def stats(self) -> dict:
+        return {"store": "memory", "keys": len(self._buckets), "evicted": self.evicted}
+
+
+# Token bucket atómico en Redis (o cualquier servidor compatible: KeyDB,
+# Dragonfly...). La clave expira cuando el bucket se habría llenado.
+_REDIS_TAKE = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local data = redis.call('HMGET', KEYS[1], 't', 'ts')
+local tokens = tonumber(data[1]) or burst
+local ts = tonumber(data[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+  allowed = 1
+end
+redis.call('HSET', KEYS[1], 't', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisBucketStore:
+    """
+    Buckets compartidos entre workers en un Redis local. Si Redis no responde
+    se deja pasar la petición (fail-open) y se cuenta el error.
+    """
+
+    def __init__(self, url: str, prefix: str = "gateway:rl:"):
+        try:
+            import redis.asyncio as redis_asyncio
+        except ImportError as exc:
+            raise RuntimeError("RATE_LIMIT_STORE=redis requiere el paquete 'redis'") from exc
+        self._redis = redis_asyncio.from_url(url)
+        self._script = self._redis.register_script(_REDIS_TAKE)
+        self.prefix = prefix
+        self.errors = 0
+
+    async def take(self, key: str, rate: float, burst: int) -> Decision:
+        try:
+            allowed, tokens = await self._script(keys=[self.prefix + key], args=[rate, burst, time.time()])
+        except Exception:
+            self.errors += 1
+            return Decision(allowed=True, remaining=burst, retry_after=0.0, reset=0.0)
+        return _decision(bool(int(allowed)), float(tokens), rate, burst)
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+    def stats(self) -> dict:
+        return {"store": "redis", "errors": self.errors}
+
+
+def build_store():
+    if RATE_LIMIT_STORE == "redis":
+        return RedisBucketStore(RATE_LIMIT_REDIS_URL)
+    return MemoryBucketStore()
+
+
+# =====================================================
+#               IDENTIFICACIÓN DEL CLIENTE
+# =====================================================
+def _header(scope: Scope, name: bytes) -> Optional[str]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def client_key(scope: Scope, key_by: str) -> str:
+    """
+    Identidad del cliente según la política: `api_key` (X-API-Key de
+    RATE_LIMIT_API_KEYS), `subject` (sub del JWT verificado por el
+    AuthMiddleware) o `ip`. Solo cuentan identidades verificadas: un token o
+    una clave que el cliente puede inventar no le da un bucket nuevo, así que
+    si falta la identidad pedida se usa la IP.
+    """
+    if key_by == "api_key":
+        api_key = _header(scope, b"x-api-key")
+        if api_key and api_key in RATE_LIMIT_API_KEYS:
+            return f"key:{api_key}"
+    elif key_by == "subject":
+        identity = scope.get("state", {}).get("identity")
+        if identity is not None and identity.subject:
+            return f"sub:{identity.subject}"
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+def limit_headers(limit: RateLimit, decision: Decision) -> dict:
+    headers = {
+        "RateLimit-Limit": str(limit.capacity),
+        "RateLimit-Remaining": str(decision.remaining),
+        "RateLimit-Reset": str(math.ceil(decision.reset)),
+        "RateLimit-Policy": f"{limit.requests};w={int(limit.per)}",
+    }
+    if not decision.allowed:
+        headers["Retry-After"] = str(max(1, math.ceil(decision.retry_after)))
+    return headers
+
+
+# =====================================================
+#                 MIDDLEWARE ASGI
+# =====================================================
+class RateLimitMiddleware:
+    """
+    Resuelve la ruta en el trie (el match queda en scope["state"] y el proxy
+    lo reutiliza) y aplica su cuota con token buckets. Excedida la cuota
+    responde 429 con Retry-After sin llegar al upstream; en las respuestas
+    permitidas añade los headers RateLimit-*.
+    """
+
+    def __init__(self, app: ASGIApp, runtime: GatewayRuntime):
+        self.app = app
+        self.runtime = runtime
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not RATE_LIMIT_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        match, _ = resolve(self.runtime, scope)
+        limit = match.route.rate_limit if match is not None else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        scope["state"]["route"] = match.route
+        key = f"{match.route.method}:{match.route.template}:{client_key(scope, limit.key)}"
+        decision = await rate_limiter.store.take(key, limit.rate, limit.capacity)
+        headers = limit_headers(limit, decision)
+        if not decision.allowed:
+            rate_limiter.rejected += 1
+            response = JSONResponse({"detail": "Demasiadas peticiones"}, status_code=429, headers=headers)
+            await response(scope, receive, send)
+            return
+
+        raw_headers = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()]
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + raw_headers
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+class RateLimiter:
+    """Contenedor del store activo; se crea y cierra en el lifespan de cada worker."""
+
+    def __init__(self):
+        self.store = MemoryBucketStore()
+        self.rejected = 0
+
+    async def start(self) -> None:
+        self.store = build_store()
+        self.rejected = 0
+
+    async def stop(self) -> None:
+        await self.store.close()
+
+    def stats(self) -> dict:
+        return {"enabled": RATE_LIMIT_ENABLED, "rejected": self.rejected, **self.store.stats()}
+
+
+rate_limiter = RateLimiter()
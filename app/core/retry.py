@@ -0,0 +1,103 @@
+# core/retry.py
+import random
+import time
+from typing import List
+
+import httpx
+
+from app.core.config import env_float, env_int
+
+
+RETRY_MAX_RETRIES = env_int("RETRY_MAX_RETRIES", 2)
+RETRY_BACKOFF_BASE = env_float("RETRY_BACKOFF_BASE", 0.05)
+RETRY_BACKOFF_MAX = env_float("RETRY_BACKOFF_MAX", 1.0)
+# bodies de PUT/DELETE hasta este tamaño se guardan en memoria para poder reintentarlos
+RETRY_MAX_BODY_BYTES = env_int("RETRY_MAX_BODY_BYTES", 64 * 1024)
+RETRY_BUDGET_RATIO = env_float("RETRY_BUDGET_RATIO", 0.1)
+RETRY_BUDGET_MIN = env_int("RETRY_BUDGET_MIN", 10)
+RETRY_BUDGET_WINDOW = env_int("RETRY_BUDGET_WINDOW", 10)
+
+# Solo métodos idempotentes; nunca POST (/auth/login, /reservas...)
+RETRYABLE_METHODS = {"GET", "PUT", "DELETE"}
+RETRYABLE_STATUS = {502, 503, 504}
+# errores en los que el upstream no llegó a procesar la petición o la conexión
+# keep-alive se cayó; un ReadTimeout no se reintenta para no duplicar carga lenta
+RETRYABLE_ERRORS = (
+    httpx.ConnectError,
+    httpx.ConnectTimeout,
+    httpx.RemoteProtocolError,
+    httpx.ReadError,
+    httpx.WriteError,
+)
+# la conexión no llegó a establecerse: nada se envió y se puede repetir en
+# otra instancia incluso un POST, si su body es reproducible (Route.spool)
+FAILOVER_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+
+
+def backoff(retry: int) -> float:
+    """Backoff exponencial con full jitter: uniforme en [0, min(max, base * 2^n)]."""
+    return random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * (2 ** retry)))
+
+
+class RetryBudget:
+    """
+    Presupuesto global de reintentos: en la ventana deslizante, los reintentos
+    no pueden superar ratio * peticiones (+ un mínimo fijo para tráfico bajo).
+    Evita que los reintentos amplifiquen una caída del upstream.
+    """
+
+    def __init__(self, ratio: float, minimum: int, window_seconds: int):
+        self.ratio = ratio
+        self.minimum = minimum
+        self.window_seconds = window_seconds
+        self.reset()
+
+    def reset(self) -> None:
+        self._seconds: List[int] = [-1] * self.window_seconds
+        self._requests: List[int] = [0] * self.window_seconds
+        self._retries: List[int] = [0] * self.window_seconds
+        self.total_retries = 0
+        self.exhausted = 0
+
+    def _slot(self) -> int:
+        second = int(time.monotonic())
+        slot = second % len(self._seconds)
+        if self._seconds[slot] != second:
+            self._seconds[slot] = second
+            self._requests[slot] = 0
+            self._retries[slot] = 0
+        return slot
+
+    def _window(self):
+        oldest = int(time.monotonic()) - len(self._seconds)
+        requests = retries = 0
+        for i, second in enumerate(self._seconds):
+            if second > oldest:
+                requests += self._requests[i]
+                retries += self._retries[i]
+        return requests, retries
+
+    def record_request(self) -> None:
+        self._requests[self._slot()] += 1
+
+    def try_acquire(self) -> bool:
+        requests, retries = self._window()
+        if retries >= self.minimum + self.ratio * requests:
+            self.exhausted += 1
+            return False
+        self._retries[self._slot()] += 1
+        self.total_retries += 1
+        return True
+
+    def stats(self) -> dict:
+        requests, retries = self._window()
+        return {
+            "window_requests": requests,
+            "window_retries": retries,
+            "ratio": self.ratio,
+            "retries": self.total_retries,
+            "budget_exhausted": self.exhausted,
+        }
+
+
+retry_budget = RetryBudget(RETRY_BUDGET_RATIO, RETRY_BUDGET_MIN, RETRY_BUDGET_WINDOW)
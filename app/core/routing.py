@@ -0,0 +1,221 @@
+# core/routing.py
+from dataclasses import dataclass, field, replace
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import unquote
+
+
+# =====================================================
+#              TABLA DECLARATIVA DE RUTAS
+# =====================================================
+@dataclass(frozen=True)
+class Timeouts:
+    """Timeouts por fase en segundos; None hereda el del upstream."""
+    connect: Optional[float] = None
+    read: Optional[float] = None
+    write: Optional[float] = None
+    pool: Optional[float] = None
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """
+    Cuota por cliente: `requests` peticiones cada `per` segundos con ráfaga
+    de hasta `burst` (por defecto = requests). `key`: ip, api_key o subject.
+    """
+    requests: int
+    per: float
+    key: str = "ip"
+    burst: Optional[int] = None
+
+    @property
+    def rate(self) -> float:
+        return self.requests / self.per
+
+    @property
+    def capacity(self) -> int:
+        return self.burst if self.burst is not None else self.requests
+
+
+@dataclass(frozen=True)
+class Hedge:
+    """
+    Petición de cobertura para GET: si el primer intento no ha respondido en
+    `delay` segundos se envía otro a una instancia distinta y se usa la
+    primera respuesta. Sin `delay`, la espera es el `percentile` de la
+    latencia observada en la ruta.
+    """
+    delay: Optional[float] = None
+    percentile: float = 0.95
+
+
+@dataclass(frozen=True)
+class Route:
+    """
+    Una ruta proxy: método + plantilla de path relativa al prefijo del
+    servicio. `prefix` y `upstream` se completan con service_routes(); el
+    resto de campos son la política por ruta.
+    """
+    method: str
+    path: str
+    name: str = ""
+    prefix: str = ""
+    upstream: str = ""
+    # segundos de cache para GET (None = sin cache)
+    cache_ttl: Optional[float] = None
+    timeouts: Optional[Timeouts] = None
+    # reintentos máximos (GET/PUT/DELETE; POST/PATCH solo failover con
+    # spool=True); None = RETRY_MAX_RETRIES
+    retries: Optional[int] = None
+    rate_limit: Optional[RateLimit] = None
+    # JWT en el gateway: "optional" valida el Bearer si viene, "required" lo
+    # exige y "none" no lo toca (login, refresh...)
+    auth: str = "optional"
+    # "high": se atiende antes en la cola del bulkhead y no se descarta por CoDel
+    priority: str = "normal"
+    # bytes máximos del body (None = BODY_MAX_BYTES); más grande -> 413
+    max_body: Optional[int] = None
+    # lee el body entero (en memoria o en disco) antes de contactar al
+    # upstream: permite reintentar uploads y failover de POST/PATCH
+    spool: bool = False
+    # GET con petición de cobertura a otra instancia si tarda (None = sin hedging)
+    hedge: Optional[Hedge] = None
+
+    @property
+    def template(self) -> str:
+        return f"{self.prefix}{self.path}"
+
+
+def service_routes(prefix: str, upstream: str, routes: Iterable[Route]) -> List[Route]:
+    """Asocia un grupo de rutas a su prefijo público y a su upstream."""
+    return [replace(route, prefix=prefix, upstream=upstream) for route in routes]
+
+
+@dataclass
+class RouteMatch:
+    route: Route
+    params: Dict[str, str]
+    # path a pedir al upstream (el path público sin el prefijo del servicio)
+    upstream_path: str
+
+
+# =====================================================
+#                TRIE POR SEGMENTOS DE PATH
+# =====================================================
+class _Leaf(NamedTuple):
+    """Ruta de un nodo con lo que el match necesita ya calculado."""
+    route: Route
+    param_names: Tuple[str, ...]
+    # segmentos del prefijo de servicio que se quitan para el upstream
+    prefix_depth: int
+
+
+@dataclass
+class _Node:
+    static: Dict[str, "_Node"] = field(default_factory=dict)
+    param: Optional["_Node"] = None
+    methods: Dict[str, _Leaf] = field(default_factory=dict)
+
+
+def _segments(path: str) -> List[str]:
+    return [segment for segment in path.split("/") if segment]
+
+
+def _is_param(segment: str) -> bool:
+    return segment.startswith("{") and segment.endswith("}")
+
+
+class RouteTable:
+    """
+    Compila la tabla de rutas una sola vez en un trie por segmentos. El match
+    cuesta O(segmentos del path): los segmentos estáticos tienen prioridad
+    sobre los parámetros y solo se retrocede si el método no coincide
+    (mismo comportamiento que el orden de rutas que tenía FastAPI).
+    """
+
+    def __init__(self, routes: Iterable[Route]):
+        self.routes: List[Route] = []
+        self._root = _Node()
+        for route in routes:
+            self.add(route)
+
+    def add(self, route: Route) -> None:
+        node = self._root
+        for segment in _segments(route.template):
+            if _is_param(segment):
+                # el nombre del parámetro sale de la plantilla de cada ruta,
+                # así /{Usu_id} y /{Dir_id} comparten nodo
+                if node.param is None:
+                    node.param = _Node()
+                node = node.param
+            else:
+                node = node.static.setdefault(segment, _Node())
+        method = route.method.upper()
+        if method in node.methods:
+            raise ValueError(f"Ruta duplicada: {method} {route.template}")
+        node.methods[method] = _Leaf(route, tuple(_param_names(route.template)), len(_segments(route.prefix)))
+        self.routes.append(route)
+
+    def match(self, method: str, path: str, raw_path: Optional[str] = None) -> Tuple[Optional[RouteMatch], List[str]]:
+        """
+        Devuelve (match, []) si hay una ruta para el método, o
+        (None, métodos_permitidos) si el path existe con otros métodos
+        (405) o (None, []) si no existe (404).
+
+        Con `raw_path` (scope["raw_path"], sin decodificar) se separa por
+        segmentos antes de decodificar, así un %2F no parte un parámetro, y
+        el path del upstream es el que envió el cliente, codificado y con sus
+        "//", sin el prefijo del servicio.
+        """
+        if raw_path is None:
+            segments = _segments(path)
+        else:
+            segments = [unquote(segment) for segment in _segments(raw_path)]
+        method = method.upper()
+        allowed: List[str] = []
+        found = self._walk(self._root, segments, 0, method, [], allowed)
+        if found is None:
+            return None, allowed
+        leaf, values = found
+        params = dict(zip(leaf.param_names, values))
+        if raw_path is None:
+            upstream_path = "/" + "/".join(segments[leaf.prefix_depth:])
+        else:
+            upstream_path = _strip_prefix(raw_path, leaf.prefix_depth)
+        return RouteMatch(route=leaf.route, params=params, upstream_path=upstream_path), []
+
+    def _walk(self, node: _Node, segments: List[str], i: int, method: str,
+              values: List[str], allowed: List[str]) -> Optional[Tuple[_Leaf, List[str]]]:
+        if i == len(segments):
+            leaf = node.methods.get(method)
+            if leaf is not None:
+                return leaf, list(values)
+            if node.methods and not allowed:
+                allowed.extend(sorted(node.methods))
+            return None
+        child = node.static.get(segments[i])
+        if child is not None:
+            found = self._walk(child, segments, i + 1, method, values, allowed)
+            if found is not None:
+                return found
+        if node.param is not None:
+            values.append(segments[i])
+            found = self._walk(node.param, segments, i + 1, method, values, allowed)
+            values.pop()
+            if found is not None:
+                return found
+        return None
+
+
+def _param_names(template: str) -> List[str]:
+    return [segment[1:-1] for segment in _segments(template) if _is_param(segment)]
+
+
+def _strip_prefix(raw_path: str, depth: int) -> str:
+    """Quita los `depth` primeros segmentos no vacíos y deja el resto tal cual."""
+    parts = raw_path.split("/")
+    i = skipped = 0
+    while skipped < depth and i < len(parts):
+        if parts[i]:
+            skipped += 1
+        i += 1
+    return "/" + "/".join(parts[i:])
@@ -0,0 +1,244 @@
+# core/runtime.py
+import asyncio
+import dataclasses
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import UpstreamConfig, env_float, env_str, load_upstream_config, load_upstreams
+from app.core.routing import Hedge, RateLimit, Route, RouteMatch, RouteTable, Timeouts, service_routes
+from app.core.upstreams import (
+    Upstream,
+    build_upstreams,
+    close_clients,
+    current_upstreams,
+    install_upstreams,
+    start_clients,
+)
+
+
+# Fichero YAML/JSON con upstreams y rutas; sin él se usan las variables de
+# entorno y las tablas de app/routes. Se vigila y se recarga en caliente.
+GATEWAY_CONFIG = env_str("GATEWAY_CONFIG", "")
+CONFIG_WATCH_INTERVAL = env_float("CONFIG_WATCH_INTERVAL", 2.0)
+# segundos que se mantiene abierto un pool retirado para las peticiones en curso
+UPSTREAM_DRAIN_SECONDS = env_float("UPSTREAM_DRAIN_SECONDS", 60.0)
+
+UPSTREAM_FIELDS = {f.name for f in dataclasses.fields(UpstreamConfig)} - {"name"}
+ROUTE_FIELDS = {"method", "path", "name", "cache_ttl", "timeouts", "retries", "rate_limit", "auth", "priority",
+                "max_body", "spool", "hedge"}
+
+
+class ConfigError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """Configuración vigente: tabla de rutas + upstreams. Inmutable."""
+    version: int
+    table: RouteTable
+    upstreams: Dict[str, Upstream]
+    source: str
+    loaded_at: float
+
+
+# =====================================================
+#                 LECTURA DEL FICHERO
+# =====================================================
+def read_config_file(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if path.endswith((".yaml", ".yml")):
+        try:
+            import yaml
+        except ImportError as exc:
+            raise ConfigError("Un fichero YAML requiere el paquete 'PyYAML'") from exc
+        data = yaml.safe_load(text)
+    else:
+        data = json.loads(text)
+    if not isinstance(data, dict):
+        raise ConfigError("La configuración debe ser un objeto con 'upstreams' y/o 'services'")
+    return data
+
+
+def parse_upstreams(data: Dict[str, Any]) -> Dict[str, UpstreamConfig]:
+    """
+    upstreams: {nombre: {urls, timeout, http2, ...}}. Lo que no define el
+    fichero sale de las variables de entorno, igual que sin fichero.
+    """
+    configs = load_upstreams()
+    for name, values in (data.get("upstreams") or {}).items():
+        values = dict(values or {})
+        unknown = set(values) - UPSTREAM_FIELDS
+        if unknown:
+            raise ConfigError(f"Upstream '{name}': campos desconocidos {sorted(unknown)}")
+        if isinstance(values.get("urls"), str):
+            values["urls"] = [url.strip() for url in values["urls"].split(",") if url.strip()]
+        base = configs.get(name) or load_upstream_config(name)
+        configs[name] = dataclasses.replace(base, **values)
+    return configs
+
+
+def parse_route(values: Dict[str, Any]) -> Route:
+    unknown = set(values) - ROUTE_FIELDS
+    if unknown:
+        raise ConfigError(f"Ruta {values.get('method')} {values.get('path')}: campos desconocidos {sorted(unknown)}")
+    values = dict(values)
+    if values.get("timeouts") is not None:
+        values["timeouts"] = Timeouts(**values["timeouts"])
+    if values.get("rate_limit") is not None:
+        values["rate_limit"] = RateLimit(**values["rate_limit"])
+    if values.get("hedge") is not None:
+        values["hedge"] = Hedge(**values["hedge"])
+    values["method"] = str(values["method"]).upper()
+    return Route(**values)
+
+
+def parse_routes(data: Dict[str, Any], default: List[Route]) -> List[Route]:
+    """
+    services: [{prefix, upstream, routes: [{method, path, name, cache_ttl,
+    timeouts, retries, rate_limit, auth, priority, max_body, spool,
+    hedge}]}]. Sin `services` se usan las tablas declarativas de app/routes.
+    """
+    services = data.get("services")
+    if services is None:
+        return list(default)
+    routes: List[Route] = []
+    for service in services:
+        try:
+            routes += service_routes(service["prefix"], service["upstream"],
+                                     [parse_route(route) for route in service["routes"]])
+        except (KeyError, TypeError) as exc:
+            raise ConfigError(f"Servicio mal definido: {service!r} ({exc})") from exc
+    return routes
+
+
+def build_snapshot_parts(data: Dict[str, Any], default_routes: List[Route]) -> Tuple[Dict[str, UpstreamConfig], RouteTable]:
+    configs = parse_upstreams(data)
+    routes = parse_routes(data, default_routes)
+    missing = {route.upstream for route in routes} - set(configs)
+    if missing:
+        raise ConfigError(f"Rutas hacia upstreams no definidos: {sorted(missing)}")
+    try:
+        table = RouteTable(routes)
+    except ValueError as exc:
+        raise ConfigError(str(exc)) from exc
+    return configs, table
+
+
+# =====================================================
+#            CONFIGURACIÓN VIGENTE + RECARGA
+# =====================================================
+class GatewayRuntime:
+    """
+    Mantiene el Snapshot vigente. Una recarga construye uno nuevo y lo
+    sustituye con una sola asignación: las peticiones nuevas usan el nuevo y
+    las que están en curso terminan con el que fijaron al empezar (resolve).
+    Una configuración inválida se rechaza y se conserva la anterior.
+    """
+
+    def __init__(self, default_routes: List[Route], path: str = GATEWAY_CONFIG):
+        self.default_routes = default_routes
+        self.path = path
+        self._snapshot: Optional[Snapshot] = None
+        self._mtime: Optional[float] = None
+        self._watch_task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self.reloads = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def current(self) -> Snapshot:
+        if self._snapshot is None:
+            raise RuntimeError("Configuración no cargada (¿se ejecutó el lifespan?)")
+        return self._snapshot
+
+    def _read(self) -> Dict[str, Any]:
+        if not self.path:
+            return {}
+        self._mtime = os.stat(self.path).st_mtime
+        return read_config_file(self.path)
+
+    async def start(self) -> None:
+        self._lock = asyncio.Lock()
+        self.reloads = 0
+        self.last_error = None
+        # en el arranque un fichero inválido es un error fatal
+        configs, table = build_snapshot_parts(self._read(), self.default_routes)
+        await start_clients(configs)
+        self._snapshot = Snapshot(1, table, current_upstreams(), self.path or "env", time.time())
+        if self.path and CONFIG_WATCH_INTERVAL > 0:
+            self._watch_task = asyncio.create_task(self._watch())
+
+    async def stop(self) -> None:
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+        await close_clients()
+        self._snapshot = None
+
+    async def reload(self) -> bool:
+        """Relee el fichero y, si es válido, sustituye la configuración."""
+        async with self._lock:
+            try:
+                configs, table = build_snapshot_parts(self._read(), self.default_routes)
+                upstreams, retired = build_upstreams(configs, self.current.upstreams)
+            except Exception as exc:
+                # fichero ilegible, YAML/JSON mal formado o rutas inválidas
+                self.last_error = f"{type(exc).__name__}: {exc}"
+                return False
+            install_upstreams(upstreams, retired, UPSTREAM_DRAIN_SECONDS)
+            self._snapshot = Snapshot(self.current.version + 1, table, upstreams, self.path or "env", time.time())
+            self.reloads += 1
+            self.last_error = None
+            return True
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(CONFIG_WATCH_INTERVAL)
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError:
+                continue
+            if mtime != self._mtime:
+                await self.reload()
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            "source": self.path or "env",
+            "version": snapshot.version if snapshot else None,
+            "loaded_at": snapshot.loaded_at if snapshot else None,
+            "routes": len(snapshot.table.routes) if snapshot else 0,
+            "upstreams": {name: u.config.urls for name, u in snapshot.upstreams.items()} if snapshot else {},
+            "reloads": self.reloads,
+            "last_error": self.last_error,
+        }
+
+
+def resolve(runtime: GatewayRuntime, scope: dict) -> Tuple[Optional[RouteMatch], List[str]]:
+    """
+    Fija el Snapshot vigente en scope["state"] y resuelve la ruta una sola
+    vez por petición: middlewares y proxy usan el mismo match y los mismos
+    upstreams aunque haya una recarga a mitad de la petición.
+    """
+    state = scope.setdefault("state", {})
+    resolved = state.get("match")
+    if resolved is None:
+        start = time.perf_counter()
+        snapshot = state["snapshot"] = runtime.current
+        raw_path = scope.get("raw_path")
+        resolved = state["match"] = snapshot.table.match(
+            scope["method"], scope["path"], raw_path.decode("latin-1") if raw_path else None
+        )
+        trace = state.get("trace")
+        if trace is not None:
+            trace.add("route", time.perf_counter() - start)
+    return resolved
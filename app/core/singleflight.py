@@ -0,0 +1,86 @@
+# core/singleflight.py
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from fastapi import Request
+
+from app.core.config import env_bool, env_int
+
+
+SINGLEFLIGHT_ENABLED = env_bool("SINGLEFLIGHT_ENABLED", True)
+# bodies GET mayores que esto no se comparten: el líder sigue en streaming
+SINGLEFLIGHT_MAX_BYTES = env_int("SINGLEFLIGHT_MAX_BYTES", 1024 * 1024)
+# alcance de autenticación: dos GET solo se unen si coinciden estos headers
+SINGLEFLIGHT_KEY_HEADERS = ("authorization", "cookie", "accept", "accept-encoding")
+
+
+def flight_key(request: Request) -> Tuple[Hashable, ...]:
+    scope = tuple(request.headers.get(h, "") for h in SINGLEFLIGHT_KEY_HEADERS)
+    return request.method, request.url.path, request.url.query, scope
+
+
+class _Flight:
+    __slots__ = ("future", "waiters")
+
+    def __init__(self, future: asyncio.Future):
+        self.future = future
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Une peticiones idénticas concurrentes: la primera (líder) hace la llamada
+    upstream y las demás esperan su resultado. Si el resultado no se puede
+    compartir (share devuelve False) o el líder se cancela, los que esperan
+    reciben None y hacen su propia petición.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, _Flight] = {}
+        self.leaders = 0
+        self.collapsed = 0
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[Any]],
+                  share: Callable[[Any], bool]) -> Tuple[Optional[Any], bool]:
+        """Devuelve (resultado, es_líder)."""
+        flight = self._inflight.get(key)
+        if flight is not None:
+            flight.waiters += 1
+            self.collapsed += 1
+            # shield: cancelar a un waiter no debe cancelar el future compartido
+            return await asyncio.shield(flight.future), False
+
+        flight = _Flight(asyncio.get_running_loop().create_future())
+        self._inflight[key] = flight
+        self.leaders += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            flight.future.set_result(None)
+            raise
+        except Exception as exc:
+            if flight.waiters:
+                flight.future.set_exception(exc)
+            else:
+                flight.future.set_result(None)
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        flight.future.set_result(result if share(result) else None)
+        return result, True
+
+    def reset(self) -> None:
+        self._inflight = {}
+        self.leaders = 0
+        self.collapsed = 0
+
+    def stats(self) -> dict:
+        return {
+            "enabled": SINGLEFLIGHT_ENABLED,
+            "in_flight": len(self._inflight),
+            "leaders": self.leaders,
+            "collapsed": self.collapsed,
+        }
+
+
+single_flight = SingleFlight()
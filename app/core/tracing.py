@@ -0,0 +1,267 @@
+# core/tracing.py
+import json
+import random
+import re
+import time
+from typing import Dict, List, Optional
+
+import httpx
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.access_log import AccessLogWriter
+from app.core.config import env_bool, env_float, env_int, env_str
+
+
+# Server-Timing con las fases de cada petición (route, queue, conn, ttfb...)
+SERVER_TIMING_ENABLED = env_bool("SERVER_TIMING_ENABLED", True)
+# exportación de spans: "otlp" (OTLP/HTTP JSON), "file" (OTLP JSON por línea) o vacío
+TRACE_EXPORTER = env_str("TRACE_EXPORTER", "").lower()
+TRACE_OTLP_ENDPOINT = env_str("TRACE_OTLP_ENDPOINT", "http://127.0.0.1:4318/v1/traces")
+TRACE_FILE = env_str("TRACE_FILE", "traces.jsonl")
+TRACE_SERVICE_NAME = env_str("TRACE_SERVICE_NAME", "api-gateway")
+# fracción de trazas nuevas que se exportan; si el cliente ya trae un
+# traceparent se respeta su decisión de muestreo
+TRACE_SAMPLE_RATE = env_float("TRACE_SAMPLE_RATE", 0.01)
+TRACE_QUEUE_SIZE = env_int("TRACE_QUEUE_SIZE", 5000)
+TRACE_BATCH_SIZE = env_int("TRACE_BATCH_SIZE", 256)
+TRACE_FLUSH_INTERVAL = env_float("TRACE_FLUSH_INTERVAL", 2.0)
+
+TRACEPARENT_RE = re.compile(r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+# orden de las fases en Server-Timing
+PHASES = ("route", "queue", "conn", "ttfb", "body")
+
+
+def new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits) or 1:0{bits // 4}x}"
+
+
+def parse_traceparent(value: str):
+    """(trace_id, parent_id, sampled) de un traceparent W3C válido, o None."""
+    found = TRACEPARENT_RE.match(value.strip())
+    if found is None:
+        return None
+    version, trace_id, parent_id, flags = found.groups()
+    if version == "ff" or trace_id == "0" * 32 or parent_id == "0" * 16:
+        return None
+    return trace_id, parent_id, bool(int(flags, 16) & 1)
+
+
+class RequestTrace:
+    """
+    Traza de una petición: el span del gateway, la duración de cada fase y,
+    solo si la traza está muestreada, los spans de los intentos upstream.
+    Sin muestrear no se crea ningún span: el coste es un par de
+    perf_counter por fase.
+    """
+
+    __slots__ = ("trace_id", "parent_id", "span_id", "sampled", "start", "start_ns", "phases", "spans")
+
+    def __init__(self, traceparent: Optional[str], recording: bool):
+        parent = parse_traceparent(traceparent) if traceparent else None
+        if parent is not None:
+            self.trace_id, self.parent_id, sampled = parent
+        else:
+            self.trace_id, self.parent_id = new_id(128), None
+            sampled = random.random() < TRACE_SAMPLE_RATE
+        self.sampled = recording and sampled
+        self.span_id = new_id(64)
+        self.start = time.perf_counter()
+        self.start_ns = time.time_ns()
+        self.phases: Dict[str, float] = {}
+        self.spans: List[dict] = []
+
+    def add(self, phase: str, seconds: float) -> None:
+        # con reintentos las fases se acumulan
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def traceparent(self, span_id: Optional[str] = None) -> str:
+        flags = "01" if self.sampled else "00"
+        return f"00-{self.trace_id}-{span_id or self.span_id}-{flags}"
+
+    def unix_ns(self, perf: float) -> int:
+        return self.start_ns + int((perf - self.start) * 1e9)
+
+    def client_span(self, span_id: str, name: str, start: float, end: float,
+                    attributes: Dict[str, object], error: bool) -> None:
+        if self.sampled:
+            self.spans.append(span_dict(
+                self.trace_id, span_id, self.span_id, name, SPAN_KIND_CLIENT,
+                self.unix_ns(start), self.unix_ns(end), attributes, error,
+            ))
+
+    def server_timing(self, total: float) -> str:
+        parts = [f"{phase};dur={self.phases[phase] * 1000:.3f}" for phase in PHASES if phase in self.phases]
+        parts.append(f"total;dur={total * 1000:.3f}")
+        return ", ".join(parts)
+
+
+# =====================================================
+#              SPANS EN FORMATO OTLP (JSON)
+# =====================================================
+def _attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def span_dict(trace_id: str, span_id: str, parent_id: Optional[str], name: str, kind: int,
+              start_ns: int, end_ns: int, attributes: Dict[str, object], error: bool) -> dict:
+    span = {
+        "traceId": trace_id,
+        "spanId": span_id,
+        "name": name,
+        "kind": kind,
+        "startTimeUnixNano": str(start_ns),
+        "endTimeUnixNano": str(end_ns),
+        "attributes": [_attribute(k, v) for k, v in attributes.items() if v is not None],
+        "status": {"code": 2 if error else 0},
+    }
+    if parent_id:
+        span["parentSpanId"] = parent_id
+    return span
+
+
+def otlp_payload(spans: List[dict]) -> dict:
+    return {"resourceSpans": [{
+        "resource": {"attributes": [_attribute("service.name", TRACE_SERVICE_NAME)]},
+        "scopeSpans": [{"scope": {"name": "app.core.tracing"}, "spans": spans}],
+    }]}
+
+
+class SpanExporter(AccessLogWriter):
+    """
+    Misma cola acotada + escritura en lotes que el access log: el hot path
+    solo encola y los spans se exportan en segundo plano, a un collector
+    OTLP/HTTP (JSON) o a un fichero con una petición OTLP por línea.
+    """
+
+    def __init__(self):
+        super().__init__(queue_size=TRACE_QUEUE_SIZE, batch_size=TRACE_BATCH_SIZE,
+                         flush_interval=TRACE_FLUSH_INTERVAL)
+        self._http: Optional[httpx.Client] = None
+        self.failed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return TRACE_EXPORTER in ("otlp", "file")
+
+    def start(self) -> None:
+        if not self.enabled:
+            return
+        if TRACE_EXPORTER == "otlp":
+            self._http = httpx.Client(timeout=5.0)
+        else:
+            self.stream = open(TRACE_FILE, "a", encoding="utf-8")
+        super().start()
+
+    async def stop(self) -> None:
+        await super().stop()
+        if self._http is not None:
+            self._http.close()
+            self._http = None
+        elif self.enabled and not self.stream.closed:
+            self.stream.close()
+
+    def _write(self, batch: List[dict]) -> None:
+        spans = [span for trace_spans in batch for span in trace_spans]
+        payload = otlp_payload(spans)
+        if self._http is None:
+            self.stream.write(json.dumps(payload, separators=(",", ":")) + "\n")
+            self.stream.flush()
+        else:
+            try:
+                self._http.post(TRACE_OTLP_ENDPOINT, json=payload).raise_for_status()
+            except httpx.HTTPError:
+                # collector caído: el lote se pierde, el gateway sigue
+                self.failed += len(spans)
+                return
+        self.written += len(spans)
+
+    def stats(self) -> dict:
+        return {
+            "exporter": TRACE_EXPORTER or None,
+            "sample_rate": TRACE_SAMPLE_RATE,
+            "server_timing": SERVER_TIMING_ENABLED,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "exported_spans": self.written,
+            "failed_spans": self.failed,
+            "dropped_traces": self.dropped,
+        }
+
+
+span_exporter = SpanExporter()
+
+
+# =====================================================
+#                 MIDDLEWARE ASGI
+# =====================================================
+class TracingMiddleware:
+    """
+    Crea la RequestTrace de la petición (propagando el traceparent del
+    cliente si es válido), añade Server-Timing al empezar la respuesta y,
+    si la traza está muestreada, exporta el span del gateway con la
+    transferencia del body al terminar. En respuestas en streaming el body
+    aún no se ha enviado al escribir los headers: la transferencia solo
+    aparece en el span.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+        trace = RequestTrace(traceparent, span_exporter.enabled)
+        state = scope.setdefault("state", {})
+        state["trace"] = trace
+        status = 500
+        headers_at = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status, headers_at
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers_at = time.perf_counter()
+                if SERVER_TIMING_ENABLED:
+                    MutableHeaders(scope=message).append("server-timing", trace.server_timing(headers_at - trace.start))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if trace.sampled:
+                end = time.perf_counter()
+                route = state.get("route")
+                attributes: Dict[str, object] = {
+                    "http.request.method": scope["method"],
+                    "url.path": scope["path"],
+                    "http.route": route.template if route is not None else None,
+                    "http.response.status_code": status,
+                    "gateway.upstream": route.upstream if route is not None else None,
+                }
+                for phase, seconds in trace.phases.items():
+                    attributes[f"gateway.{phase}_ms"] = round(seconds * 1000, 3)
+                if headers_at is not None:
+                    attributes["gateway.transfer_ms"] = round((end - headers_at) * 1000, 3)
+                trace.spans.append(span_dict(
+                    trace.trace_id, trace.span_id, trace.parent_id,
+                    f"{scope['method']} {attributes['http.route'] or scope['path']}", SPAN_KIND_SERVER,
+                    trace.start_ns, trace.unix_ns(end), attributes, status >= 500,
+                ))
+                span_exporter.submit(trace.spans)
@@ -0,0 +1,213 @@
+# core/upstreams.py
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+import httpx
+
+from app.core.balancer import Instance, UpstreamGroup
+from app.core.breaker import CircuitBreaker, load_breaker_config
+from app.core.bulkhead import Bulkhead, load_bulkhead_config
+from app.core.config import UpstreamConfig
+
+
+# Un AsyncClient de larga vida por upstream: reutiliza conexiones keep-alive
+# en lugar de pagar un handshake TCP/TLS nuevo en cada petición. Con varias
+# instancias, httpx mantiene un pool por origen dentro del mismo cliente.
+@dataclass
+class Upstream:
+    """Estado de un upstream: pool, breaker, instancias y bulkhead."""
+    config: UpstreamConfig
+    client: httpx.AsyncClient
+    breaker: CircuitBreaker
+    group: UpstreamGroup
+    bulkhead: Bulkhead
+
+
+# conjunto vigente; una recarga lo sustituye entero (nunca se modifica)
+_upstreams: Dict[str, Upstream] = {}
+_health_task: Optional[asyncio.Task] = None
+_retiring: Set[asyncio.Task] = set()
+
+# campos que fija el AsyncClient al crearse: si cambian hace falta pool nuevo
+CLIENT_FIELDS = ("timeout", "connect_timeout", "http2", "max_connections",
+                 "max_keepalive_connections", "keepalive_expiry")
+
+
+def build_client(config: UpstreamConfig) -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=config.max_connections,
+        max_keepalive_connections=config.max_keepalive_connections,
+        keepalive_expiry=config.keepalive_expiry,
+    )
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(config.timeout, connect=config.connect_timeout),
+        limits=limits,
+        http2=config.http2,
+        # sin esto httpx pediría gzip/br/zstd por su cuenta y un cliente que no
+        # manda Accept-Encoding recibiría bytes comprimidos; se reenvía solo el
+        # Accept-Encoding del cliente y la compresión la negocia el gateway
+        headers={"accept-encoding": "identity"},
+    )
+
+
+def build_upstreams(configs: Dict[str, UpstreamConfig],
+                    previous: Dict[str, Upstream]) -> Tuple[Dict[str, Upstream], List[httpx.AsyncClient]]:
+    """
+    Construye un conjunto nuevo reutilizando lo que sigue siendo válido: el
+    pool si no cambian sus parámetros, las Instance de las URLs que se
+    mantienen y el breaker. Devuelve también los clientes que dejan de usarse.
+    """
+    upstreams: Dict[str, Upstream] = {}
+    for name, config in configs.items():
+        old = previous.get(name)
+        if old is not None and old.config == config:
+            upstreams[name] = old
+            continue
+        same_pool = old is not None and all(
+            getattr(old.config, f) == getattr(config, f) for f in CLIENT_FIELDS
+        )
+        upstreams[name] = Upstream(
+            config=config,
+            client=old.client if same_pool else build_client(config),
+            breaker=old.breaker if old is not None else CircuitBreaker(name, load_breaker_config(name)),
+            group=UpstreamGroup(name, config.urls, config.balancer, previous=old.group if old else None),
+            # por defecto tantos huecos como conexiones del pool: la espera ocurre
+            # en la cola del bulkhead (acotada y con timeout) y no en httpx
+            bulkhead=(old.bulkhead if same_pool
+                      else Bulkhead(name, load_bulkhead_config(name), config.max_connections)),
+        )
+    kept = {id(upstream.client) for upstream in upstreams.values()}
+    retired = [upstream.client for upstream in previous.values() if id(upstream.client) not in kept]
+    return upstreams, retired
+
+
+def install_upstreams(upstreams: Dict[str, Upstream], retired: List[httpx.AsyncClient],
+                      drain_seconds: float) -> None:
+    """
+    Sustituye el conjunto vigente de una vez. Las peticiones en curso siguen
+    con el suyo; los pools retirados se cierran tras `drain_seconds`.
+    """
+    global _upstreams
+    _upstreams = upstreams
+    for client in retired:
+        task = asyncio.create_task(_close_later(client, drain_seconds))
+        _retiring.add(task)
+        task.add_done_callback(_retiring.discard)
+
+
+async def _close_later(client: httpx.AsyncClient, delay: float) -> None:
+    try:
+        await asyncio.sleep(delay)
+    finally:
+        await client.aclose()
+
+
+async def start_clients(configs: Dict[str, UpstreamConfig]) -> None:
+    """Crea los pools de conexiones y el health check. Se llama desde el lifespan."""
+    global _health_task
+    upstreams, _ = build_upstreams(configs, {})
+    install_upstreams(upstreams, [], 0)
+    _health_task = asyncio.create_task(_health_loop())
+
+
+async def close_clients() -> None:
+    """Cierra limpiamente el health check y todos los pools al apagar la app."""
+    global _health_task, _upstreams
+    if _health_task is not None:
+        _health_task.cancel()
+        try:
+            await _health_task
+        except asyncio.CancelledError:
+            pass
+        _health_task = None
+    # los pools retirados por una recarga se cierran ya
+    for task in list(_retiring):
+        task.cancel()
+    await asyncio.gather(*_retiring, return_exceptions=True)
+    clients = {id(u.client): u.client for u in _upstreams.values()}
+    _upstreams = {}
+    for client in clients.values():
+        await client.aclose()
+
+
+def current_upstreams() -> Dict[str, Upstream]:
+    return _upstreams
+
+
+def mark_failure(config: UpstreamConfig, instance: Instance) -> None:
+    """Fallo pasivo (error de conexión): cuenta igual que un health check fallido."""
+    instance.mark(False, config.unhealthy_threshold, config.healthy_threshold)
+
+
+# =====================================================
+#               HEALTH CHECKS ACTIVOS
+# =====================================================
+async def check_instance(upstream: Upstream, instance: Instance) -> None:
+    """
+    GET <instancia><health_path>. Cualquier respuesta < 500 cuenta como sana
+    (un 404 indica que el proceso responde aunque no exponga /health).
+    """
+    config = upstream.config
+    try:
+        resp = await upstream.client.get(f"{instance.url}{config.health_path}", timeout=config.health_timeout)
+        ok = resp.status_code < 500
+    except (httpx.HTTPError, httpx.InvalidURL):
+        ok = False
+    instance.last_check = time.monotonic()
+    instance.mark(ok, config.unhealthy_threshold, config.healthy_threshold)
+
+
+async def _health_loop() -> None:
+    while True:
+        now = time.monotonic()
+        checks: List = []
+        upstreams = _upstreams
+        for upstream in upstreams.values():
+            interval = upstream.config.health_interval
+            for instance in upstream.group.instances:
+                if instance.last_check is None or now - instance.last_check >= interval:
+                    checks.append(check_instance(upstream, instance))
+        if checks:
+            await asyncio.gather(*checks)
+        await asyncio.sleep(min((u.config.health_interval for u in upstreams.values()), default=5.0) / 2)
+
+
+# =====================================================
+#                   ESTADÍSTICAS
+# =====================================================
+def breaker_stats() -> Dict[str, dict]:
+    return {name: upstream.breaker.stats() for name, upstream in _upstreams.items()}
+
+
+def bulkhead_stats() -> Dict[str, dict]:
+    return {name: upstream.bulkhead.stats() for name, upstream in _upstreams.items()}
+
+
+def instance_stats() -> Dict[str, dict]:
+    return {name: upstream.group.stats() for name, upstream in _upstreams.items()}
+
+
+def pool_stats() -> Dict[str, dict]:
+    """
+    Conexiones en uso vs. ociosas de cada pool. httpx no expone el pool de
+    httpcore públicamente, así que se accede con getattr y se tolera su ausencia.
+    """
+    stats: Dict[str, dict] = {}
+    for name, upstream in _upstreams.items():
+        config = upstream.config
+        pool = getattr(getattr(upstream.client, "_transport", None), "_pool", None)
+        connections = list(getattr(pool, "connections", []))
+        idle = sum(1 for conn in connections if conn.is_idle())
+        stats[name] = {
+            "urls": config.urls,
+            "http2": config.http2,
+            "max_connections": config.max_connections,
+            "max_keepalive_connections": config.max_keepalive_connections,
+            "keepalive_expiry": config.keepalive_expiry,
+            "connections": len(connections),
+            "in_use": len(connections) - idle,
+            "idle": idle,
+        }
+    return stats
@@ -1,28 +1,111 @@
-from fastapi import FastAPI, Request
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
-# Importación de routers con los nombres exactos
-from app.routes.user_service import router as user_router
-from app.routes.inventory_service import router as inventory_router
-from app.routes.services_service import router as services_router
+from app.core.access_log import AccessLogMiddleware, access_log
+from app.core.auth import JWT_ENABLED, AuthMiddleware, token_verifier
+from app.core.body import body_spool
+from app.core.cache import response_cache
+from app.core.compression import CompressionMiddleware
+from app.core.conditional import conditional_support
+from app.core.hedge import hedging
+from app.core.metrics import MetricsMiddleware, metrics
+from app.core.notify import notification_hub
+from app.core.proxy import ProxyApp
+from app.core.ratelimit import RateLimitMiddleware, rate_limiter
+from app.core.retry import retry_budget
+from app.core.singleflight import single_flight
+from app.core.tracing import TracingMiddleware, span_exporter
+
+from app.routes.aggregates import router as aggregates_router
+from app.routes.batch import router as batch_router
+from app.routes.gateway import metrics_router, router as gateway_router
+from app.routes.notifications import NOTIFICATIONS_STREAM, notification_stream
+from app.routes.table import SERVICE_PREFIXES, gateway_runtime
+
+
+# =====================================================
+#          LIFESPAN – ESTADO POR WORKER Y POOLS
+# =====================================================
+# Cada worker (python -m app.serve) ejecuta su propio lifespan: el estado se
+# inicializa aquí y no al importar, así es seguro también con fork/preload.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    response_cache.reset()
+    single_flight.reset()
+    conditional_support.reset()
+    retry_budget.reset()
+    hedging.reset()
+    metrics.reset()
+    body_spool.reset()
+    if JWT_ENABLED:
+        token_verifier.load_keys()
+    await gateway_runtime.start()
+    access_log.start()
+    span_exporter.start()
+    await rate_limiter.start()
+    await notification_hub.start(app)
+    try:
+        yield
+    finally:
+        await notification_hub.stop()
+        await gateway_runtime.stop()
+        await rate_limiter.stop()
+        await span_exporter.stop()
+        await access_log.stop()
 
 
 app = FastAPI(
     title="API Gateway - E-commerce Mascotas",
     version="1.0.0",
-    description="Gateway unificado para los microservicios del proyecto."
+    description="Gateway unificado para los microservicios del proyecto.",
+    lifespan=lifespan,
 )
 
 
+# =====================================================
+#                 MIDDLEWARE – COMPRESIÓN
+# =====================================================
+# zstd / br / gzip según Accept-Encoding, en streaming. Es el más interno:
+# métricas y access log cuentan los bytes ya comprimidos.
+app.add_middleware(CompressionMiddleware)
+
+
+# =====================================================
+#                 MIDDLEWARE – RATE LIMITING
+# =====================================================
+# Token buckets por cliente y ruta (Route.rate_limit). Va por dentro del
+# access log y las métricas: los 429 también se registran.
+app.add_middleware(RateLimitMiddleware, runtime=gateway_runtime)
+
+
+# =====================================================
+#                 MIDDLEWARE – JWT EN EL BORDE
+# =====================================================
+# Valida el Bearer (firma, exp, aud) con cache de tokens verificados y
+# reenvía X-User-Id / X-User-Roles; los tokens inválidos no llegan al
+# upstream. Va por fuera del rate limit para que cuente por sub verificado.
+app.add_middleware(AuthMiddleware, runtime=gateway_runtime)
+
+
 # =====================================================
 #                 MIDDLEWARE – LOG DE REQUESTS
 # =====================================================
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    print(f"[Gateway] {request.method} {request.url}")
-    response = await call_next(request)
-    return response
+# Access log JSON estructurado, encolado y escrito en lotes por una tarea
+# en segundo plano (nunca bloquea el manejo de la petición)
+app.add_middleware(AccessLogMiddleware)
+# Métricas Prometheus por ruta/upstream (GET /metrics)
+app.add_middleware(MetricsMiddleware)
+
+
+# =====================================================
+#          MIDDLEWARE – SERVER-TIMING Y TRAZAS
+# =====================================================
+# Propaga/genera el traceparent W3C, añade Server-Timing por fases y exporta
+# en lotes los spans muestreados. Por fuera del resto para medir el total.
+app.add_middleware(TracingMiddleware)
 
 
 # =====================================================
@@ -40,9 +123,14 @@ app.add_middleware(
 # =====================================================
 #                 REGISTRO DE ROUTERS
 # =====================================================
-app.include_router(user_router, prefix="/user-service")
-app.include_router(inventory_router, prefix="/inventory-service")
-app.include_router(services_router, prefix="/services-service")
+app.include_router(gateway_router)
+app.include_router(metrics_router)
+# agregados BFF (/bff/*), antes del catch-all del proxy
+app.include_router(aggregates_router)
+# POST /batch: varias peticiones del gateway en un round-trip
+app.include_router(batch_router)
+# notificaciones push (SSE) en lugar de sondear /user-service/notificaciones
+app.add_route(NOTIFICATIONS_STREAM, notification_stream, methods=["GET"], include_in_schema=False)
 
 
 # =====================================================
@@ -56,13 +144,30 @@ async def root():
             "/user-service/*",
             "/inventory-service/*",
             "/services-service/*"
-        ]
+        ],
+        "aggregates": ["/bff/home/{Usu_id}"],
+        "streams": [NOTIFICATIONS_STREAM],
     }
 
 
+# =====================================================
+#         PROXY HACIA MICROSERVICIOS (TABLA DE RUTAS)
+# =====================================================
+# Un proxy ASGI puro montado bajo /user-service, /inventory-service y
+# /services-service: FastAPI queda solo para los endpoints propios del
+# gateway y las rutas proxy se resuelven en el trie de la configuración
+# vigente. Los prefijos que añada GATEWAY_CONFIG llegan por el default del
+# router (lo que no casa con ninguna ruta de FastAPI).
+proxy_app = ProxyApp(gateway_runtime)
+for prefix in SERVICE_PREFIXES:
+    app.mount(prefix, proxy_app)
+app.router.default = proxy_app
+
+
 # =====================================================
 #                         RUN LOCAL
 # =====================================================
+# Solo desarrollo (un proceso con reload). Producción: python -m app.serve
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
 
@@ -0,0 +1,44 @@
+# routes/aggregates.py
+from fastapi import APIRouter, Request
+
+from app.core.compose import Aggregate, Part, dependency_order, run_aggregate
+from app.routes.table import gateway_runtime
+
+
+# Endpoints de composición (BFF): una llamada del cliente, varias
+# sub-peticiones concurrentes dentro del gateway.
+AGGREGATES = [
+    # =====================================================
+    #                 HOME DE LA APP MÓVIL
+    # =====================================================
+    Aggregate("/bff/home/{Usu_id}", name="home", parts=(
+        Part("usuario", "/user-service/usuarios/{Usu_id}", required=True),
+        Part("mascotas", "/user-service/mascotas/usuario/{Usu_id}"),
+        Part("notificaciones", "/user-service/notificaciones/usuario/{Usu_id}", timeout=2.0),
+        # depende de mascotas: una llamada por mascota, en paralelo
+        Part("reservas", "/services-service/reservas/mascota/{mascotaId}",
+             depends_on="mascotas", each={"mascotaId": "Masc_id"}),
+    )),
+]
+
+
+def make_endpoint(aggregate: Aggregate):
+    # el agregado va en el closure: como parámetro con default, FastAPI lo
+    # tomaría como body JSON y el cliente podría mandar sus propias partes
+    async def endpoint(request: Request):
+        return await run_aggregate(aggregate, request, gateway_runtime.current.table)
+
+    return endpoint
+
+
+def build_router(aggregates) -> APIRouter:
+    router = APIRouter(tags=["bff"])
+    for aggregate in aggregates:
+        # falla al importar (arranque de cada worker) si el grafo no es válido
+        dependency_order(aggregate)
+        router.add_api_route(aggregate.path, make_endpoint(aggregate), methods=["GET"],
+                             name=aggregate.name or None)
+    return router
+
+
+router = build_router(AGGREGATES)
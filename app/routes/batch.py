@@ -0,0 +1,40 @@
+# routes/batch.py
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Request
+from pydantic import BaseModel
+
+from app.core.compose import BatchItem, run_batch
+from app.routes.table import gateway_runtime
+
+router = APIRouter(tags=["batch"])
+
+
+class BatchRequestItem(BaseModel):
+    method: str = "GET"
+    path: str
+    headers: Dict[str, str] = {}
+    # JSON (dict/list) o texto
+    body: Any = None
+    id: Optional[str] = None
+
+
+# =====================================================
+#                 LOTE DE PETICIONES
+# =====================================================
+# Un array de sub-peticiones en un solo round-trip; cada una pasa por el
+# enrutado y el reenvío normales del gateway. Responde un array en el mismo
+# orden con status, headers y body de cada una. Solo admite rutas proxy de la
+# tabla vigente.
+@router.post("/batch")
+async def batch(items: List[BatchRequestItem], request: Request):
+    return await run_batch([
+        BatchItem(
+            method=item.method.upper(),
+            path=item.path,
+            headers=tuple(sorted((k.lower(), v) for k, v in item.headers.items())),
+            body=item.body,
+            id=item.id,
+        )
+        for item in items
+    ], request, gateway_runtime.current.table)
@@ -0,0 +1,275 @@
+# routes/gateway.py
+from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from app.core.access_log import access_log
+from app.core.auth import require_admin, token_verifier
+from app.core.body import body_spool
+from app.core.breaker import CLOSED, HALF_OPEN, OPEN
+from app.core.cache import response_cache
+from app.core.conditional import conditional_support
+from app.core.hedge import hedging
+from app.core.metrics import render
+from app.core.notify import notification_hub
+from app.core.ratelimit import rate_limiter
+from app.core.retry import retry_budget
+from app.core.singleflight import single_flight
+from app.core.tracing import span_exporter
+from app.core.upstreams import breaker_stats, bulkhead_stats, instance_stats, pool_stats
+from app.routes.table import gateway_runtime
+
+# estado y recarga de la configuración: solo administradores (require_admin)
+router = APIRouter(dependencies=[Depends(require_admin)])
+# /metrics queda abierto para el scraper de Prometheus
+metrics_router = APIRouter()
+
+
+# =====================================================
+#             ENDPOINTS PROPIOS DEL GATEWAY
+# =====================================================
+
+@router.get("/gateway/pools")
+async def estado_pools():
+    # conexiones en uso vs. ociosas por upstream
+    return pool_stats()
+
+
+@router.get("/gateway/upstreams")
+async def estado_instancias():
+    # instancias de cada servicio: salud, peticiones en curso y balanceo
+    return instance_stats()
+
+
+@router.get("/gateway/breakers")
+async def estado_breakers():
+    # estado del circuit breaker de cada upstream
+    return breaker_stats()
+
+
+@router.get("/gateway/bulkheads")
+async def estado_bulkheads():
+    # huecos ocupados, cola por prioridad, espera en cola y rechazos (503)
+    return bulkhead_stats()
+
+
+@router.get("/gateway/retries")
+async def estado_reintentos():
+    # reintentos hechos y rechazados por el presupuesto global
+    return retry_budget.stats()
+
+
+@router.get("/gateway/access-log")
+async def estado_access_log():
+    # entradas escritas y descartadas por cola llena
+    return access_log.stats()
+
+
+@router.get("/gateway/auth")
+async def estado_auth():
+    # tokens verificados en cache, aciertos y rechazados con 401
+    return token_verifier.stats()
+
+
+@router.get("/gateway/ratelimit")
+async def estado_rate_limit():
+    # peticiones rechazadas con 429 y buckets vivos en el store
+    return rate_limiter.stats()
+
+
+@router.get("/gateway/tracing")
+async def estado_trazas():
+    # spans exportados, fallidos (collector caído) y trazas descartadas por cola llena
+    return span_exporter.stats()
+
+
+@router.get("/gateway/bodies")
+async def estado_bodies():
+    # uploads leídos enteros (spool), cuántos pasaron a disco y rechazados con 413
+    return body_spool.stats()
+
+
+@router.get("/gateway/hedging")
+async def estado_hedging():
+    # coberturas lanzadas, ganadas, omitidas (sin instancia o presupuesto) y espera actual por ruta
+    return hedging.stats()
+
+
+@router.get("/gateway/notifications")
+async def estado_notificaciones():
+    # conexiones SSE, usuarios sondeados, sondeos (304 incluidos) y sesiones cortadas por lentas
+    return notification_hub.stats()
+
+
+@router.get("/gateway/routes")
+async def tabla_rutas():
+    return [
+        {"method": route.method, "path": route.template, "upstream": route.upstream, "name": route.name}
+        for route in gateway_runtime.current.table.routes
+    ]
+
+
+@router.get("/gateway/config")
+async def estado_config():
+    # versión de la configuración vigente, recargas y último error
+    return gateway_runtime.stats()
+
+
+@router.post("/gateway/reload")
+async def recargar_config():
+    # recarga manual (además del sondeo de CONFIG_WATCH_INTERVAL)
+    if not gateway_runtime.path:
+        return JSONResponse({"detail": "Sin GATEWAY_CONFIG no hay fichero que recargar"}, status_code=409)
+    ok = await gateway_runtime.reload()
+    return JSONResponse(gateway_runtime.stats(), status_code=200 if ok else 422)
+
+
+@router.get("/gateway/cache")
+async def estado_cache():
+    # hits, misses, evictions e invalidaciones de la cache de GET
+    return response_cache.stats()
+
+
+@router.get("/gateway/etags")
+async def estado_etags():
+    # rutas cuyo upstream ya maneja ETag / Last-Modified (condicionales directos)
+    return conditional_support.stats()
+
+
+@router.get("/gateway/singleflight")
+async def estado_singleflight():
+    # GET idénticos concurrentes unidos en una sola llamada upstream
+    return single_flight.stats()
+
+
+# =====================================================
+#                   MÉTRICAS PROMETHEUS
+# =====================================================
+BREAKER_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+def collect_gauges() -> dict:
+    """Series calculadas en el momento del scrape a partir del estado del worker."""
+    pools = pool_stats()
+    cache = response_cache.stats()
+    flights = single_flight.stats()
+    retries = retry_budget.stats()
+    logs = access_log.stats()
+    limits = rate_limiter.stats()
+    tokens = token_verifier.stats()
+    bulkheads = bulkhead_stats()
+    traces = span_exporter.stats()
+    bodies = body_spool.stats()
+    notifications = notification_hub.stats()
+    hedges = hedging.stats()
+    return {
+        "gateway_upstream_connections": ("gauge", "Conexiones del pool por estado.", [
+            ({"upstream": name, "state": state}, pool[state])
+            for name, pool in pools.items() for state in ("in_use", "idle")
+        ]),
+        "gateway_upstream_max_connections": ("gauge", "Límite de conexiones del pool.", [
+            ({"upstream": name}, pool["max_connections"]) for name, pool in pools.items()
+        ]),
+        "gateway_upstream_instance_healthy": ("gauge", "1 si la instancia está sana.", [
+            ({"upstream": name, "instance": instance["url"]}, int(instance["healthy"]))
+            for name, group in instance_stats().items() for instance in group["instances"]
+        ]),
+        "gateway_upstream_instance_outstanding": ("gauge", "Peticiones en curso por instancia.", [
+            ({"upstream": name, "instance": instance["url"]}, instance["outstanding"])
+            for name, group in instance_stats().items() for instance in group["instances"]
+        ]),
+        "gateway_circuit_breaker_state": ("gauge", "Estado del breaker: 0 closed, 1 half_open, 2 open.", [
+            ({"upstream": name}, BREAKER_STATE_VALUES[breaker["state"]]) for name, breaker in breaker_stats().items()
+        ]),
+        "gateway_circuit_breaker_rejected_total": ("counter", "Peticiones rechazadas con el circuito abierto.", [
+            ({"upstream": name}, breaker["rejected"]) for name, breaker in breaker_stats().items()
+        ]),
+        "gateway_bulkhead_active": ("gauge", "Llamadas en curso dentro del bulkhead.", [
+            ({"upstream": name}, bulkhead["active"]) for name, bulkhead in bulkheads.items()
+        ]),
+        "gateway_bulkhead_queue_depth": ("gauge", "Peticiones esperando hueco en el bulkhead.", [
+            ({"upstream": name, "priority": priority}, depth)
+            for name, bulkhead in bulkheads.items() for priority, depth in bulkhead["queued"].items()
+        ]),
+        "gateway_bulkhead_queue_delay_seconds": ("gauge", "Última espera en cola del bulkhead.", [
+            ({"upstream": name}, bulkhead["queue_delay"]) for name, bulkhead in bulkheads.items()
+        ]),
+        "gateway_bulkhead_shedding": ("gauge", "1 si el bulkhead está descartando por sobrecarga.", [
+            ({"upstream": name}, int(bulkhead["shedding"])) for name, bulkhead in bulkheads.items()
+        ]),
+        "gateway_bulkhead_rejected_total": ("counter", "Peticiones rechazadas con 503 por el bulkhead.", [
+            ({"upstream": name, "reason": reason}, count)
+            for name, bulkhead in bulkheads.items() for reason, count in bulkhead["rejected"].items()
+        ]),
+        "gateway_cache_hits_total": ("counter", "Aciertos de la cache de GET.", [({}, cache["hits"])]),
+        "gateway_cache_misses_total": ("counter", "Fallos de la cache de GET.", [({}, cache["misses"])]),
+        "gateway_cache_evictions_total": ("counter", "Entradas expulsadas por LRU.", [({}, cache["evictions"])]),
+        "gateway_cache_bytes": ("gauge", "Bytes almacenados en la cache.", [({}, cache["bytes"])]),
+        "gateway_singleflight_collapsed_total": ("counter", "GET unidos a una llamada en curso.", [
+            ({}, flights["collapsed"])
+        ]),
+        "gateway_retries_total": ("counter", "Reintentos hechos.", [({}, retries["retries"])]),
+        "gateway_retry_budget_exhausted_total": ("counter", "Reintentos rechazados por presupuesto.", [
+            ({}, retries["budget_exhausted"])
+        ]),
+        "gateway_hedge_requests_total": ("counter", "Peticiones de cobertura lanzadas.", [({}, hedges["hedged"])]),
+        "gateway_hedge_wins_total": ("counter", "Coberturas que respondieron antes que el primer intento.", [
+            ({}, hedges["wins"])
+        ]),
+        "gateway_hedge_budget_exhausted_total": ("counter", "Coberturas rechazadas por presupuesto.", [
+            ({}, hedges["budget_exhausted"])
+        ]),
+        "gateway_hedge_delay_seconds": ("gauge", "Espera adaptativa antes de la cobertura (percentil observado).", [
+            ({"route": route}, delay) for route, delay in hedges["delays"].items()
+        ]),
+        "gateway_jwt_cache_hits_total": ("counter", "Tokens servidos desde la cache de verificados.", [
+            ({}, tokens["hits"])
+        ]),
+        "gateway_jwt_rejected_total": ("counter", "Tokens rechazados con 401.", [({}, tokens["rejected"])]),
+        "gateway_rate_limited_total": ("counter", "Peticiones rechazadas con 429 por rate limit.", [
+            ({}, limits["rejected"])
+        ]),
+        "gateway_access_log_dropped_total": ("counter", "Entradas de log descartadas por cola llena.", [
+            ({}, logs["dropped"])
+        ]),
+        "gateway_body_spooled_total": ("counter", "Bodies reproducibles leídos antes de reenviar.", [
+            ({"storage": "memory"}, bodies["spooled"] - bodies["spooled_to_disk"]),
+            ({"storage": "disk"}, bodies["spooled_to_disk"]),
+        ]),
+        "gateway_body_spool_files": ("gauge", "Ficheros temporales de spool abiertos.", [({}, bodies["on_disk"])]),
+        "gateway_body_rejected_total": ("counter", "Peticiones rechazadas con 413 por tamaño de body.", [
+            ({}, bodies["rejected"])
+        ]),
+        "gateway_notify_sessions": ("gauge", "Conexiones SSE de notificaciones abiertas.", [
+            ({}, notifications["sessions"])
+        ]),
+        "gateway_notify_feeds": ("gauge", "Usuarios con sondeo compartido activo.", [({}, notifications["feeds"])]),
+        "gateway_notify_polls_total": ("counter", "Sondeos de notificaciones al upstream.", [
+            ({"result": "changed"}, notifications["polls"] - notifications["not_modified"] - notifications["poll_errors"]),
+            ({"result": "not_modified"}, notifications["not_modified"]),
+            ({"result": "error"}, notifications["poll_errors"]),
+        ]),
+        "gateway_notify_pushed_total": ("counter", "Eventos de notificación enviados a sesiones.", [
+            ({}, notifications["pushed"])
+        ]),
+        "gateway_notify_dropped_total": ("counter", "Sesiones SSE cortadas por no leer (back-pressure).", [
+            ({}, notifications["dropped_slow"])
+        ]),
+        "gateway_notify_closed_total": ("counter", "Sesiones SSE cerradas por el gateway.", [
+            ({"reason": "expired"}, notifications["expired"]),
+            ({"reason": "send_error"}, notifications["send_errors"]),
+        ]),
+        "gateway_trace_spans_exported_total": ("counter", "Spans exportados al sink de trazas.", [
+            ({}, traces["exported_spans"])
+        ]),
+        "gateway_trace_spans_failed_total": ("counter", "Spans perdidos por error del collector.", [
+            ({}, traces["failed_spans"])
+        ]),
+        "gateway_trace_dropped_total": ("counter", "Trazas descartadas por cola llena.", [
+            ({}, traces["dropped_traces"])
+        ]),
+    }
+
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse)
+async def metricas():
+    return PlainTextResponse(render(collect_gauges()), media_type="text/plain; version=0.0.4")
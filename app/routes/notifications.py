@@ -0,0 +1,30 @@
+# routes/notifications.py
+from urllib.parse import quote
+
+from fastapi import Request
+from starlette.types import Receive, Scope, Send
+
+from app.core.notify import notification_hub
+
+
+# Notificaciones push por Server-Sent Events: el cliente abre una conexión en
+# lugar de sondear la ruta de origen. El gateway la sondea una vez por
+# usuario, con las credenciales de la sesión, y envía solo lo nuevo.
+NOTIFICATIONS_STREAM = "/stream/notificaciones/{Usu_id}"
+NOTIFICATIONS_SOURCE = "/user-service/notificaciones/usuario/{Usu_id}"
+
+
+class NotificationStream:
+    """
+    Endpoint ASGI puro: la respuesta SSE vive tanto como la conexión y no
+    pasa por la serialización de FastAPI.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        request = Request(scope, receive)
+        path = NOTIFICATIONS_SOURCE.format(Usu_id=quote(request.path_params["Usu_id"], safe=""))
+        response = await notification_hub.subscribe(request, path)
+        await response(scope, receive, send)
+
+
+notification_stream = NotificationStream()
@@ -0,0 +1,17 @@
+# routes/table.py
+from app.core.runtime import GatewayRuntime
+
+from app.routes.user_service import ROUTES as USER_ROUTES
+from app.routes.inventory_service import ROUTES as INVENTORY_ROUTES
+from app.routes.services_service import ROUTES as SERVICES_ROUTES
+
+
+# Rutas por defecto; GATEWAY_CONFIG puede sustituirlas por las de un fichero.
+# La tabla se compila al arrancar cada worker y en cada recarga.
+ROUTES = [*USER_ROUTES, *INVENTORY_ROUTES, *SERVICES_ROUTES]
+
+# configuración vigente (rutas + upstreams), recargable en caliente
+gateway_runtime = GatewayRuntime(ROUTES)
+
+# Prefijos donde se monta el proxy ASGI; el trie decide 404/405 por ruta
+SERVICE_PREFIXES = sorted({route.prefix for route in ROUTES})
@@ -1,210 +1,74 @@
-from fastapi import APIRouter, Depends, Request, Response
-import httpx
-import os
-
-router = APIRouter()
-
-USER_SERVICE_URL = os.getenv("AUTH_SERVICE_URL")
-
-
-# -----------------------------------------
-# Helper: reenviar peticiones al microservicio
-# -----------------------------------------
-async def forward_request(method: str, path: str, request: Request):
-    async with httpx.AsyncClient() as client:
-        body = await request.body()
-
-        # Headers válidos (evitar errores con host, content-length, etc.)
-        headers = {
-            key: value
-            for key, value in request.headers.items()
-            if key.lower() not in ["host", "content-length", "connection"]
-        }
-
-        # Query params
-        query_params = request.query_params
-
-        # Realizar la petición
-        response = await client.request(
-            method=method,
-            url=f"{USER_SERVICE_URL}{path}",
-            content=body,
-            headers=headers,
-            params=query_params,
-        )
-
-        # Devolver respuesta compatible con FastAPI
-        return Response(
-            content=response.content,
-            status_code=response.status_code,
-            headers=dict(response.headers),
-            media_type=response.headers.get("content-type")
-        )
-
-
-# =====================================================
-#                     AUTH
-# =====================================================
-
-@router.post("/auth/login")
-async def login(request: Request):
-    return await forward_request("POST", "/auth/login", request)
-
-@router.post("/auth/register")
-async def register(request: Request):
-    return await forward_request("POST", "/auth/register", request)
-
-@router.post("/auth/refresh")
-async def refresh(request: Request):
-    return await forward_request("POST", "/auth/refresh", request)
-
-@router.post("/auth/forgot-password")
-async def forgot_password(request: Request):
-    return await forward_request("POST", "/auth/forgot-password", request)
-
-@router.post("/auth/reset-password")
-async def reset_password(request: Request):
-    return await forward_request("POST", "/auth/reset-password", request)
-
-@router.post("/auth/profile")
-async def profile(request: Request):
-    return await forward_request("POST", "/auth/profile", request)
-
-
-# =====================================================
-#                   DIRECCIONES
-# =====================================================
-
-@router.get("/direcciones/usuario/{Usu_id}")
-async def direcciones_por_usuario(Usu_id: str, request: Request):
-    return await forward_request("GET", f"/direcciones/usuario/{Usu_id}", request)
-
-@router.post("/direcciones/{Usu_id}")
-async def crear_direccion(Usu_id: str, request: Request):
-    return await forward_request("POST", f"/direcciones/{Usu_id}", request)
-
-@router.put("/direcciones/{Dir_id}")
-async def actualizar_direccion(Dir_id: str, request: Request):
-    return await forward_request("PUT", f"/direcciones/{Dir_id}", request)
-
-@router.delete("/direcciones/{Dir_id}")
-async def eliminar_direccion(Dir_id: str, request: Request):
-    return await forward_request("DELETE", f"/direcciones/{Dir_id}", request)
-
-
-# =====================================================
-#                     MASCOTAS
-# =====================================================
-
-@router.get("/mascotas/usuario/{Usu_id}")
-async def mascotas_por_usuario(Usu_id: str, request: Request):
-    return await forward_request("GET", f"/mascotas/usuario/{Usu_id}", request)
-
-@router.post("/mascotas/{Usu_id}")
-async def crear_mascota(Usu_id: str, request: Request):
-    return await forward_request("POST", f"/mascotas/{Usu_id}", request)
-
-@router.put("/mascotas/{Masc_id}")
-async def actualizar_mascota(Masc_id: str, request: Request):
-    return await forward_request("PUT", f"/mascotas/{Masc_id}", request)
-
-@router.delete("/mascotas/{Masc_id}")
-async def eliminar_mascota(Masc_id: str, request: Request):
-    return await forward_request("DELETE", f"/mascotas/{Masc_id}", request)
-
-
-# =====================================================
-#                 MÉTODOS DE PAGO
-# =====================================================
-
-@router.get("/metodos-pago/usuario/{Usu_id}")
-async def pagos_por_usuario(Usu_id: str, request: Request):
-    return await forward_request("GET", f"/metodos-pago/usuario/{Usu_id}", request)
-
-@router.post("/metodos-pago/{Usu_id}")
-async def crear_metodo_pago(Usu_id: str, request: Request):
-    return await forward_request("POST", f"/metodos-pago/{Usu_id}", request)
-
-@router.put("/metodos-pago/{Met_id}")
-async def actualizar_metodo_pago(Met_id: str, request: Request):
-    return await forward_request("PUT", f"/metodos-pago/{Met_id}", request)
-
-@router.delete("/metodos-pago/{Met_id}")
-async def eliminar_metodo_pago(Met_id: str, request: Request):
-    return await forward_request("DELETE", f"/metodos-pago/{Met_id}", request)
-
-@router.put("/metodos-pago/predeterminado/{Usu_id}/{Met_id}")
-async def marcar_predeterminado(Usu_id: str, Met_id: str, request: Request):
-    return await forward_request("PUT", f"/metodos-pago/predeterminado/{Usu_id}/{Met_id}", request)
-
-
-# =====================================================
-#                   NOTIFICACIONES
-# =====================================================
-
-@router.get("/notificaciones/usuario/{Usu_id}")
-async def notificaciones_por_usuario(Usu_id: str, request: Request):
-    return await forward_request("GET", f"/notificaciones/usuario/{Usu_id}", request)
-
-@router.post("/notificaciones/{Usu_id}")
-async def crear_notificacion(Usu_id: str, request: Request):
-    return await forward_request("POST", f"/notificaciones/{Usu_id}", request)
-
-@router.put("/notificaciones/leer/{Not_id}")
-async def marcar_leida(Not_id: str, request: Request):
-    return await forward_request("PUT", f"/notificaciones/leer/{Not_id}", request)
-
-@router.delete("/notificaciones/{Not_id}")
-async def eliminar_notificacion(Not_id: str, request: Request):
-    return await forward_request("DELETE", f"/notificaciones/{Not_id}", request)
-
-
-# =====================================================
-#                       ROLES
-# =====================================================
-
-@router.get("/roles")
-async def roles(request: Request):
-    return await forward_request("GET", "/roles", request)
-
-@router.get("/roles/{id}")
-async def obtener_rol(id: str, request: Request):
-    return await forward_request("GET", f"/roles/{id}", request)
-
-@router.post("/roles")
-async def crear_rol(request: Request):
-    return await forward_request("POST", "/roles", request)
-
-@router.put("/roles/{id}")
-async def actualizar_rol(id: str, request: Request):
-    return await forward_request("PUT", f"/roles/{id}", request)
-
-@router.delete("/roles/{id}")
-async def eliminar_rol(id: str, request: Request):
-    return await forward_request("DELETE", f"/roles/{id}", request)
-
-
-# =====================================================
-#                     USUARIOS
-# =====================================================
-
-@router.get("/usuarios")
-async def usuarios(request: Request):
-    return await forward_request("GET", "/usuarios", request)
-
-@router.get("/usuarios/{id}")
-async def usuario_por_id(id: str, request: Request):
-    return await forward_request("GET", f"/usuarios/{id}", request)
-
-@router.post("/usuarios")
-async def crear_usuario(request: Request):
-    return await forward_request("POST", "/usuarios", request)
-
-@router.put("/usuarios/{id}")
-async def actualizar_usuario(id: str, request: Request):
-    return await forward_request("PUT", f"/usuarios/{id}", request)
-
-@router.delete("/usuarios/{id}")
-async def eliminar_usuario(id: str, request: Request):
-    return await forward_request("DELETE", f"/usuarios/{id}", request)
-
+# routes/user_service.py
+from app.core.routing import RateLimit, Route, service_routes
+
+# Tabla declarativa: método + plantilla de path -> upstream "user" (AUTH_SERVICE_URL).
+# El path se reenvía tal cual (sin el prefijo /user-service), con su query string.
+# auth="none": endpoints de autenticación, el gateway no valida su Bearer
+# (p. ej. refresh llega con el access token ya expirado).
+# priority="high": /auth/* se atiende antes en el bulkhead y no se descarta por carga.
+# rate_limit: login y recuperación de contraseña limitados por IP (fuerza bruta / spam de correos).
+LOGIN_LIMIT = RateLimit(10, 60, key="ip", burst=5)
+FORGOT_PASSWORD_LIMIT = RateLimit(3, 300, key="ip")
+
+ROUTES = service_routes("/user-service", "user", [
+    # =====================================================
+    #                     AUTH
+    # =====================================================
+    Route("POST", "/auth/login", "login", rate_limit=LOGIN_LIMIT, auth="none", priority="high"),
+    Route("POST", "/auth/register", "register", auth="none", priority="high"),
+    Route("POST", "/auth/refresh", "refresh", auth="none", priority="high"),
+    Route("POST", "/auth/forgot-password", "forgot_password", rate_limit=FORGOT_PASSWORD_LIMIT, auth="none", priority="high"),
+    Route("POST", "/auth/reset-password", "reset_password", auth="none", priority="high"),
+    Route("POST", "/auth/profile", "profile", auth="required", priority="high"),
+
+    # =====================================================
+    #                   DIRECCIONES
+    # =====================================================
+    Route("GET", "/direcciones/usuario/{Usu_id}", "direcciones_por_usuario"),
+    Route("POST", "/direcciones/{Usu_id}", "crear_direccion"),
+    Route("PUT", "/direcciones/{Dir_id}", "actualizar_direccion"),
+    Route("DELETE", "/direcciones/{Dir_id}", "eliminar_direccion"),
+
+    # =====================================================
+    #                     MASCOTAS
+    # =====================================================
+    Route("GET", "/mascotas/usuario/{Usu_id}", "mascotas_por_usuario"),
+    Route("POST", "/mascotas/{Usu_id}", "crear_mascota"),
+    Route("PUT", "/mascotas/{Masc_id}", "actualizar_mascota"),
+    Route("DELETE", "/mascotas/{Masc_id}", "eliminar_mascota"),
+
+    # =====================================================
+    #                 MÉTODOS DE PAGO
+    # =====================================================
+    Route("GET", "/metodos-pago/usuario/{Usu_id}", "pagos_por_usuario"),
+    Route("POST", "/metodos-pago/{Usu_id}", "crear_metodo_pago"),
+    Route("PUT", "/metodos-pago/{Met_id}", "actualizar_metodo_pago"),
+    Route("DELETE", "/metodos-pago/{Met_id}", "eliminar_metodo_pago"),
+    Route("PUT", "/metodos-pago/predeterminado/{Usu_id}/{Met_id}", "marcar_predeterminado"),
+
+    # =====================================================
+    #                   NOTIFICACIONES
+    # =====================================================
+    Route("GET", "/notificaciones/usuario/{Usu_id}", "notificaciones_por_usuario"),
+    Route("POST", "/notificaciones/{Usu_id}", "crear_notificacion"),
+    Route("PUT", "/notificaciones/leer/{Not_id}", "marcar_leida"),
+    Route("DELETE", "/notificaciones/{Not_id}", "eliminar_notificacion"),
+
+    # =====================================================
+    #                       ROLES
+    # =====================================================
+    Route("GET", "/roles", "roles"),
+    Route("GET", "/roles/{id}", "obtener_rol"),
+    Route("POST", "/roles", "crear_rol"),
+    Route("PUT", "/roles/{id}", "actualizar_rol"),
+    Route("DELETE", "/roles/{id}", "eliminar_rol"),
+
+    # =====================================================
+    #                     USUARIOS
+    # =====================================================
+    Route("GET", "/usuarios", "usuarios"),
+    Route("GET", "/usuarios/{id}", "usuario_por_id"),
+    Route("POST", "/usuarios", "crear_usuario"),
+    Route("PUT", "/usuarios/{id}", "actualizar_usuario"),
+    Route("DELETE", "/usuarios/{id}", "eliminar_usuario"),
+])
@@ -0,0 +1,61 @@
+# app/serve.py
+"""
+Arranque de producción: N workers de uvicorn (uno por CPU disponible), con
+uvloop y httptools si están instalados.
+
+    python -m app.serve
+
+Cada worker es un proceso con su propio lifespan, así que pools, cache,
+métricas y colas se crean por worker. Con SIGTERM uvicorn deja de aceptar
+conexiones, espera a las peticiones en curso (hasta GRACEFUL_TIMEOUT) y
+ejecuta el shutdown del lifespan, que cierra los pools limpiamente.
+"""
+import importlib.util
+import math
+import os
+
+import uvicorn
+
+from app.core.config import env_int, env_str
+
+
+def available_cpus() -> int:
+    """CPUs utilizables: afinidad del proceso acotada por la cuota de cgroup (contenedores)."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as cpu_max:
+            quota, period = cpu_max.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return max(1, cpus)
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def main() -> None:
+    uvicorn.run(
+        "app.main:app",
+        host=env_str("HOST", "0.0.0.0"),
+        port=env_int("PORT", 5000),
+        workers=env_int("WEB_CONCURRENCY", available_cpus()),
+        loop="uvloop" if _installed("uvloop") else "asyncio",
+        http="httptools" if _installed("httptools") else "h11",
+        backlog=env_int("BACKLOG", 2048),
+        timeout_keep_alive=env_int("KEEPALIVE_TIMEOUT", 5),
+        timeout_graceful_shutdown=env_int("GRACEFUL_TIMEOUT", 30),
+        # el gateway escribe su propio access log estructurado
+        access_log=False,
+        proxy_headers=True,
+        forwarded_allow_ips=env_str("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+    )
+
+
+if __name__ == "__main__":
+    main()
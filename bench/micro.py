@@ -0,0 +1,51 @@
+# bench/micro.py
+"""
+Microbenchmarks de las funciones del hot path del gateway (sin red).
+
+    python -m bench.micro
+"""
+import json
+import timeit
+
+from starlette.requests import Request
+
+from app.core.cache import response_cache
+from app.core.metrics import Metrics
+from app.core.proxy import request_headers
+from app.core.routing import RouteTable
+from app.routes.table import ROUTES
+
+
+def _request() -> Request:
+    headers = [
+        (b"host", b"gateway"), (b"user-agent", b"bench"), (b"accept", b"*/*"),
+        (b"authorization", b"Bearer " + b"x" * 180), (b"connection", b"keep-alive"),
+        (b"content-type", b"application/json"), (b"accept-encoding", b"gzip"),
+    ]
+    return Request({
+        "type": "http", "method": "GET", "path": "/inventory-service/stock/12/34",
+        "query_string": b"page=2", "headers": headers, "scheme": "http", "server": ("gateway", 80),
+    })
+
+
+def run(number: int = 100000) -> dict:
+    request = _request()
+    metrics = Metrics()
+    table = RouteTable(ROUTES)
+    cases = {
+        "route_match_static": lambda: table.match("GET", "/user-service/auth/login"),
+        "route_match_params": lambda: table.match("GET", "/inventory-service/stock/12/34"),
+        "route_match_fallback": lambda: table.match("GET", "/services-service/reservas/9"),
+        "request_headers": lambda: request_headers(request.scope),
+        "cache_key": lambda: response_cache.key_for(request),
+        "metrics_record": lambda: metrics.record(("/r", "GET", "u"), 200, 0.004, 0.003, 0, 512),
+    }
+    results = {}
+    for name, fn in cases.items():
+        seconds = min(timeit.repeat(fn, number=number, repeat=3))
+        results[name] = {"ns_per_op": round(seconds / number * 1e9, 1)}
+    return results
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(), indent=2))
@@ -0,0 +1,64 @@
+# bench/mock_upstreams.py
+"""
+Backends de prueba para el benchmark: imitan lo justo de los microservicios
+user, inventory y services para medir el overhead del gateway.
+
+    python -m uvicorn bench.mock_upstreams:app --port 9101
+"""
+import json
+import os
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+
+LISTING_BYTES = int(os.getenv("BENCH_LISTING_BYTES", str(1024 * 1024)))
+
+
+def _listing(size: int) -> bytes:
+    item = {"id": 0, "producto": "Alimento premium para perro 15kg", "cantidad": 12, "tipo": "entrada"}
+    items = []
+    body = b"[]"
+    while len(body) < size:
+        items.extend(dict(item, id=len(items) + i) for i in range(256))
+        body = json.dumps(items).encode()
+    return body
+
+
+LISTING = _listing(LISTING_BYTES)
+
+
+async def health(request: Request):
+    return JSONResponse({"status": "ok"})
+
+
+async def login(request: Request):
+    await request.body()
+    return JSONResponse({"access_token": "x" * 180, "token_type": "bearer", "expires_in": 3600})
+
+
+async def listing(request: Request):
+    return Response(LISTING, media_type="application/json")
+
+
+async def upload(request: Request):
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+    return JSONResponse({"received": received}, status_code=201)
+
+
+async def small(request: Request):
+    await request.body()
+    return JSONResponse({"id": request.path_params.get("path", ""), "nombre": "Firulais", "activo": True})
+
+
+app = Starlette(routes=[
+    Route("/health", health),
+    Route("/auth/login", login, methods=["POST"]),
+    Route("/movimientos", listing),
+    Route("/producto/upload", upload, methods=["POST"]),
+    Route("/{path:path}", small, methods=["GET", "POST", "PUT", "PATCH", "DELETE"]),
+])
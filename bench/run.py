@@ -0,0 +1,393 @@
+# bench/run.py
+"""
+Benchmark de carga reproducible del gateway.
+
+Levanta tres backends de prueba (bench.mock_upstreams) en localhost, arranca
+`app.main:app` delante de ellos y lanza tráfico por las rutas reales: GET JSON
+pequeños, listados grandes, uploads multipart a /producto/upload y POST de
+login. Cada escenario se mide también directo contra el backend para obtener
+la latencia añadida por el gateway (p50/p95/p99), además del throughput y la
+RSS del proceso del gateway.
+
+    python -m bench.run                         # ejecuta y guarda bench/results/latest.json
+    python -m bench.run --save-baseline         # guarda además bench/baseline.json
+    python -m bench.run --compare bench/baseline.json   # exit 1 si hay regresión
+
+El baseline no se versiona hasta generarlo en la máquina de referencia: sin
+él, --compare termina con exit 2 antes de lanzar carga e indica el comando
+para crearlo (primer paso).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "bench", "results")
+# baseline versionado: se genera (y regenera) con --save-baseline en la
+# máquina de referencia; hasta entonces no existe
+BASELINE_PATH = os.path.join(ROOT, "bench", "baseline.json")
+
+
+# =====================================================
+#                 PROCESOS AUXILIARES
+# =====================================================
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url: str, timeout: float = 15.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} no respondió en {timeout}s")
+
+
+def start_uvicorn(target: str, port: int, env: Optional[Dict[str, str]] = None,
+                  extra_args: Optional[List[str]] = None) -> subprocess.Popen:
+    cmd = [sys.executable, "-m", "uvicorn", target, "--host", "127.0.0.1", "--port", str(port),
+           "--log-level", "warning", "--no-access-log", *(extra_args or [])]
+    return subprocess.Popen(cmd, cwd=ROOT, env={**os.environ, **(env or {})},
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def rss_mb(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+def cpu_seconds(pid: int) -> Optional[float]:
+    """CPU (user + system) consumida por el proceso, de /proc/<pid>/stat."""
+    try:
+        with open(f"/proc/{pid}/stat") as stat:
+            fields = stat.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+class RssSampler(threading.Thread):
+    """Muestrea la RSS del gateway durante la carga para obtener el pico."""
+
+    def __init__(self, pid: int, interval: float = 0.2):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0.0
+        self._done = threading.Event()
+
+    def run(self) -> None:
+        while not self._done.is_set():
+            self.peak = max(self.peak, rss_mb(self.pid) or 0.0)
+            self._done.wait(self.interval)
+
+    def stop(self) -> None:
+        self._done.set()
+        self.join()
+
+
+@contextmanager
+def environment(gateway_args: List[str]):
+    """Arranca los 3 backends y el gateway; los detiene al salir."""
+    ports = {name: free_port() for name in ("user", "inventory", "services", "gateway")}
+    upstreams = [start_uvicorn("bench.mock_upstreams:app", ports[name]) for name in ("user", "inventory", "services")]
+    gateway = None
+    try:
+        for name in ("user", "inventory", "services"):
+            wait_for(f"http://127.0.0.1:{ports[name]}/health")
+        gateway_env = {
+            "AUTH_SERVICE_URL": f"http://127.0.0.1:{ports['user']}",
+            "INVENTORY_SERVICE_URL": f"http://127.0.0.1:{ports['inventory']}",
+            "SERVICES_SERVICE_URL": f"http://127.0.0.1:{ports['services']}",
+            # el bucle cerrado superaría las cuotas de login/upload: se mide el proxy, no los 429
+            "RATE_LIMIT_ENABLED": "false",
+        }
+        gateway = start_uvicorn("app.main:app", ports["gateway"], gateway_env, gateway_args)
+        wait_for(f"http://127.0.0.1:{ports['gateway']}/")
+        yield ports, gateway
+    finally:
+        for proc in [gateway, *upstreams]:
+            if proc is not None:
+                proc.terminate()
+        for proc in [gateway, *upstreams]:
+            if proc is not None:
+                try:
+                    proc.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+
+
+# =====================================================
+#                     ESCENARIOS
+# =====================================================
+# (nombre, upstream, método, path público, path directo, body)
+UPLOAD_BYTES = int(os.getenv("BENCH_UPLOAD_BYTES", str(512 * 1024)))
+MULTIPART_BOUNDARY = "benchboundary7MA4YWxkTrZu0gW"
+MULTIPART_BODY = (
+    f"--{MULTIPART_BOUNDARY}\r\n"
+    'Content-Disposition: form-data; name="imagenes"; filename="foto.jpg"\r\n'
+    "Content-Type: image/jpeg\r\n\r\n"
+).encode() + os.urandom(UPLOAD_BYTES) + f"\r\n--{MULTIPART_BOUNDARY}--\r\n".encode()
+LOGIN_BODY = json.dumps({"correo": "ana@example.com", "contrasena": "secreta"}).encode()
+
+SCENARIOS = {
+    "small_json_get": {
+        "upstream": "user", "method": "GET",
+        "path": lambda i: f"/user-service/usuarios/{i}", "direct": lambda i: f"/usuarios/{i}",
+    },
+    "large_listing": {
+        "upstream": "inventory", "method": "GET",
+        "path": lambda i: "/inventory-service/movimientos", "direct": lambda i: "/movimientos",
+    },
+    "multipart_upload": {
+        "upstream": "inventory", "method": "POST",
+        "path": lambda i: "/inventory-service/producto/upload", "direct": lambda i: "/producto/upload",
+        "body": MULTIPART_BODY,
+        "headers": {"content-type": f"multipart/form-data; boundary={MULTIPART_BOUNDARY}"},
+    },
+    "auth_login": {
+        "upstream": "user", "method": "POST",
+        "path": lambda i: "/user-service/auth/login", "direct": lambda i: "/auth/login",
+        "body": LOGIN_BODY, "headers": {"content-type": "application/json"},
+    },
+}
+MIX_WEIGHTS = {"small_json_get": 70, "auth_login": 15, "large_listing": 10, "multipart_upload": 5}
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99)}
+
+
+async def drive(base: str, pick: Callable[[int], tuple], duration: float, concurrency: int) -> dict:
+    """Carga en bucle cerrado: `concurrency` workers durante `duration` segundos."""
+    latencies: List[float] = []
+    errors = 0
+    counter = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base, timeout=30.0, limits=limits) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker() -> None:
+            nonlocal errors, counter
+            while time.perf_counter() < deadline:
+                counter += 1
+                method, path, body, headers = pick(counter)
+                start = time.perf_counter()
+                try:
+                    async with client.stream(method, path, content=body, headers=headers) as resp:
+                        async for _ in resp.aiter_raw():
+                            pass
+                    if resp.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "latency_ms": percentiles(latencies),
+    }
+
+
+def scenario_picker(names: List[str], direct: bool, seed: int = 7) -> Callable[[int], tuple]:
+    rng = random.Random(seed)
+    weights = [MIX_WEIGHTS.get(name, 1) for name in names]
+
+    def pick(i: int) -> tuple:
+        spec = SCENARIOS[rng.choices(names, weights)[0]] if len(names) > 1 else SCENARIOS[names[0]]
+        path = spec["direct"](i) if direct else spec["path"](i)
+        return spec["method"], path, spec.get("body"), spec.get("headers")
+
+    return pick
+
+
+def run(duration: float, concurrency: int, scenarios: List[str], gateway_args: List[str]) -> dict:
+    results: Dict[str, dict] = {}
+    with environment(gateway_args) as (ports, gateway):
+        gateway_base = f"http://127.0.0.1:{ports['gateway']}"
+        rss_start = rss_mb(gateway.pid)
+        sampler = RssSampler(gateway.pid)
+        sampler.start()
+        for name in scenarios:
+            names = list(SCENARIOS) if name == "mixed" else [name]
+            upstream = "user" if name == "mixed" else SCENARIOS[name]["upstream"]
+            # calentamiento: pools, caches y JIT de imports
+            asyncio.run(drive(gateway_base, scenario_picker(names, False), 1.0, concurrency))
+            cpu_start = cpu_seconds(gateway.pid)
+            via_gateway = asyncio.run(drive(gateway_base, scenario_picker(names, False), duration, concurrency))
+            cpu_end = cpu_seconds(gateway.pid)
+            if name == "mixed":
+                direct = None
+            else:
+                direct = asyncio.run(drive(f"http://127.0.0.1:{ports[upstream]}",
+                                           scenario_picker(names, True), duration, concurrency))
+            entry = dict(via_gateway)
+            if cpu_start is not None and cpu_end is not None and cpu_end > cpu_start:
+                # coste del gateway independiente de la CPU que gasta el generador de carga
+                cpu = cpu_end - cpu_start
+                entry["gateway_cpu_ms_per_request"] = round(cpu * 1000 / max(1, via_gateway["requests"]), 3)
+                entry["rps_per_core"] = round(via_gateway["requests"] / cpu, 1)
+            if direct is not None:
+                entry["direct_latency_ms"] = direct["latency_ms"]
+                entry["direct_rps"] = direct["rps"]
+                entry["added_latency_ms"] = {
+                    q: round(via_gateway["latency_ms"][q] - direct["latency_ms"][q], 3)
+                    for q in ("p50", "p95", "p99")
+                }
+            results[name] = entry
+            print(f"  {name}: {entry['rps']} req/s, {entry.get('rps_per_core')} req/s por core, "
+                  f"p50 {entry['latency_ms']['p50']} ms, p99 {entry['latency_ms']['p99']} ms, "
+                  f"errores {entry['errors']}", file=sys.stderr)
+        sampler.stop()
+        rss_end = rss_mb(gateway.pid)
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_rev": _git_rev(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "duration": duration,
+            "concurrency": concurrency,
+            "gateway_args": gateway_args,
+        },
+        "scenarios": results,
+        "gateway_rss_mb": {
+            "start": round(rss_start or 0, 1),
+            "peak": round(sampler.peak, 1),
+            "end": round(rss_end or 0, 1),
+        },
+    }
+
+
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# =====================================================
+#               COMPARACIÓN CON BASELINE
+# =====================================================
+def compare(current: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Lista de regresiones: throughput, latencia p95/p99 o RSS pico peores que tolerance."""
+    regressions = []
+    for name, base in baseline.get("scenarios", {}).items():
+        now = current["scenarios"].get(name)
+        if now is None:
+            continue
+        if now["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {now['rps']} < {base['rps']} req/s")
+        if "rps_per_core" in base and now.get("rps_per_core", 0) < base["rps_per_core"] * (1 - tolerance):
+            regressions.append(f"{name}: {now.get('rps_per_core')} < {base['rps_per_core']} req/s por core")
+        for q in ("p95", "p99"):
+            key = "added_latency_ms" if "added_latency_ms" in base else "latency_ms"
+            # margen absoluto de 1ms para no disparar por ruido en latencias mínimas
+            limit = base[key][q] * (1 + tolerance) + 1.0
+            if now[key][q] > limit:
+                regressions.append(f"{name}: {key} {q} {now[key][q]} > {round(limit, 3)} ms")
+    base_peak = baseline.get("gateway_rss_mb", {}).get("peak")
+    if base_peak and current["gateway_rss_mb"]["peak"] > base_peak * (1 + tolerance):
+        regressions.append(f"RSS pico {current['gateway_rss_mb']['peak']} > {base_peak} MB")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de carga del API Gateway")
+    parser.add_argument("--duration", type=float, default=10.0, help="segundos por escenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--scenario", action="append", choices=[*SCENARIOS, "mixed"],
+                        help="escenarios a ejecutar (por defecto todos + mixed)")
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "latest.json"))
+    parser.add_argument("--compare", nargs="?", const=BASELINE_PATH,
+                        help="JSON de baseline contra el que comparar (por defecto bench/baseline.json)")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="guarda el resultado como bench/baseline.json")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="regresión permitida (0.2 = 20%%)")
+    parser.add_argument("--gateway-arg", action="append", default=[],
+                        help="argumento extra para uvicorn del gateway (p.ej. --gateway-arg=--loop=uvloop)")
+    args = parser.parse_args(argv)
+    if args.compare and not os.path.exists(args.compare):
+        # se comprueba antes de lanzar carga: sin baseline no hay nada que comparar
+        print(missing_baseline(args.compare), file=sys.stderr)
+        return 2
+
+    scenarios = args.scenario or [*SCENARIOS, "mixed"]
+    result = run(args.duration, args.concurrency, scenarios, args.gateway_arg)
+    result["micro"] = _micro()
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as out:
+        json.dump(result, out, indent=2)
+    if args.save_baseline:
+        with open(BASELINE_PATH, "w") as out:
+            json.dump(result, out, indent=2)
+    print(json.dumps(result, indent=2))
+
+    if args.compare:
+        with open(args.compare) as base_file:
+            regressions = compare(result, json.load(base_file), args.tolerance)
+        if regressions:
+            print("REGRESIONES:\n  " + "\n  ".join(regressions), file=sys.stderr)
+            return 1
+        print("Sin regresiones respecto al baseline.", file=sys.stderr)
+    elif not args.save_baseline and not os.path.exists(BASELINE_PATH):
+        print(missing_baseline(BASELINE_PATH), file=sys.stderr)
+    return 0
+
+
+def missing_baseline(path: str) -> str:
+    shown = os.path.relpath(path, ROOT) if path.startswith(ROOT) else path
+    return (
+        f"No hay baseline en {shown}. Primer paso, en la máquina de referencia:\n"
+        "  python -m bench.run --save-baseline\n"
+        "y versiona bench/baseline.json; después --compare detecta regresiones."
+    )
+
+
+def _micro() -> dict:
+    from bench.micro import run as run_micro
+    return run_micro(number=20000)
+
+
+if __name__ == "__main__":
+    sys.exit(main())